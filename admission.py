@@ -0,0 +1,220 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+
+import metrics
+
+# Requests doing upstream work at once, and how many more may wait (and for
+# how long) before new ones are turned away with 429.
+ADMISSION_MAX_ACTIVE = int(os.getenv("ADMISSION_MAX_ACTIVE", "32"))
+ADMISSION_MAX_QUEUED = int(os.getenv("ADMISSION_MAX_QUEUED", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))
+
+# Per upstream: calls in flight, and calls started per minute (0 = no rate
+# limit). Set these to the provider's quota.
+UPSTREAM_CONCURRENCY = {
+    "maps": int(os.getenv("MAPS_CONCURRENCY", "20")),
+    "weather": int(os.getenv("WEATHER_CONCURRENCY", "20")),
+    "gemini": int(os.getenv("GEMINI_CONCURRENCY", "8")),
+}
+UPSTREAM_CALLS_PER_MINUTE = {
+    "maps": float(os.getenv("MAPS_CALLS_PER_MINUTE", "0")),
+    "weather": float(os.getenv("WEATHER_CALLS_PER_MINUTE", "0")),
+    "gemini": float(os.getenv("GEMINI_CALLS_PER_MINUTE", "0")),
+}
+UPSTREAM_MAX_WAITING = int(os.getenv("UPSTREAM_MAX_WAITING", "64"))
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "5"))
+
+# Lower runs first. Cache hits never queue at all.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+PRIORITY_UNCACHED = 2
+
+
+class Overloaded(Exception):
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, burst: float = 1.0):
+        if per_minute <= 0:
+            raise ValueError(f"a token bucket needs a positive rate, got {per_minute}/min")
+        self.rate = per_minute / 60
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _fill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, queued: int = 0) -> float:
+        self._fill()
+        return max(0.0, (queued + 1 - self.tokens) / self.rate)
+
+    async def acquire(self):
+        while True:
+            self._fill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class UpstreamLimit:
+    # Caps one upstream's calls in flight and, optionally, their start rate.
+    # At most max_waiting callers queue for a slot; the rest fail fast.
+
+    def __init__(self, name: str, concurrency: int, per_minute: float = 0.0, max_waiting: int = UPSTREAM_MAX_WAITING):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_waiting = max_waiting
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.bucket = TokenBucket(per_minute) if per_minute > 0 else None
+        self.active = 0
+        # Callers between entering slot() and holding a slot, and those of
+        # them that found no free capacity. Both change before any await, so
+        # callers arriving in the same event-loop tick see each other.
+        self.acquiring = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    def retry_after(self) -> int:
+        if self.bucket is None:
+            return 1
+        return max(1, math.ceil(self.bucket.wait_time(self.waiting)))
+
+    async def _acquire(self):
+        await self.semaphore.acquire()
+        if self.bucket is not None:
+            try:
+                await self.bucket.acquire()
+            except BaseException:
+                self.semaphore.release()
+                raise
+
+    def _must_wait(self) -> bool:
+        if self.active + self.acquiring >= self.concurrency:
+            return True
+        return self.bucket is not None and self.bucket.wait_time(self.acquiring) > 0
+
+    @asynccontextmanager
+    async def slot(self, timeout: float | None = UPSTREAM_QUEUE_TIMEOUT):
+        # Only callers that cannot start at once count as waiting.
+        queued = self._must_wait()
+        if queued and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise Overloaded(f"{self.name}: too many calls waiting", self.retry_after())
+        self.acquiring += 1
+        if queued:
+            self.waiting += 1
+        try:
+            await asyncio.wait_for(self._acquire(), timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded(f"{self.name}: no capacity within {timeout:.2f}s", self.retry_after()) from None
+        finally:
+            self.acquiring -= 1
+            if queued:
+                self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.semaphore.release()
+
+    def stats(self) -> dict:
+        return {"active": self.active, "waiting": self.waiting, "rejected": self.rejected}
+
+
+_limits: dict[str, UpstreamLimit] = {}
+
+
+def limit(name: str) -> UpstreamLimit:
+    upstream_limit = _limits.get(name)
+    if upstream_limit is None:
+        upstream_limit = _limits[name] = UpstreamLimit(name, UPSTREAM_CONCURRENCY[name], UPSTREAM_CALLS_PER_MINUTE[name])
+        metrics.register_stats("upstream_limit", name, upstream_limit.stats)
+    return upstream_limit
+
+
+class AdmissionController:
+    # Bounds the requests doing upstream work at once. Beyond max_active they
+    # wait in a priority queue (lowest first, FIFO within a priority); a
+    # finishing request hands its slot straight to the next waiter. When the
+    # queue is full, or a waiter times out, the request gets Overloaded.
+
+    def __init__(self, max_active: int = ADMISSION_MAX_ACTIVE, max_queued: int = ADMISSION_MAX_QUEUED, queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        # Moving average of how long a request holds its slot, for Retry-After.
+        self.service_seconds = 1.0
+        self._queue: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.service_seconds * (self.waiting + 1) / self.max_active))
+
+    async def _acquire(self, priority: int):
+        if self.active < self.max_active and not self.waiting:
+            self.active += 1
+            return
+        if self.waiting >= self.max_queued:
+            self.rejected += 1
+            raise Overloaded("too many requests queued", self.retry_after())
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), future))
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded(f"no capacity within {self.queue_timeout:.0f}s", self.retry_after()) from None
+        except BaseException:
+            # Cancelled just after being handed a slot: pass it on.
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        finally:
+            self.waiting -= 1
+
+    def _release(self):
+        while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def admit(self, priority: int = PRIORITY_INTERACTIVE):
+        await self._acquire(priority)
+        self.admitted += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.service_seconds += 0.1 * (time.monotonic() - started - self.service_seconds)
+            self._release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "service_seconds": self.service_seconds,
+        }
@@ -0,0 +1,53 @@
+import hashlib
+import mimetypes
+from pathlib import Path
+
+from compression import ENCODINGS, compress
+
+STATIC_DIRECTORY = Path(__file__).resolve().parent / "static"
+# Asset URLs carry a content hash, so clients may keep them forever.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class StaticAsset:
+    __slots__ = ("name", "url_name", "media_type", "etag", "text", "bodies")
+
+    def __init__(self, path: Path):
+        body = path.read_bytes()
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        stem, dot, suffix = path.name.rpartition(".")
+        self.name = path.name
+        self.url_name = f"{stem}.{digest[:12]}.{suffix}" if dot else f"{path.name}.{digest[:12]}"
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        self.media_type = f"{media_type}; charset=utf-8" if media_type.startswith("text/") else media_type
+        self.etag = f'"{digest}"'
+        self.text = body.decode("utf-8")
+        # Compressed once at startup, never per request.
+        self.bodies = {None: body}
+        for encoding in ENCODINGS:
+            self.bodies[encoding] = compress(body, encoding)
+
+
+def _load(directory: Path) -> dict[str, StaticAsset]:
+    assets = {}
+    for path in sorted(directory.iterdir()):
+        if path.is_file():
+            asset = StaticAsset(path)
+            assets[asset.name] = asset
+    return assets
+
+
+_assets = _load(STATIC_DIRECTORY)
+_by_url_name = {asset.url_name: asset for asset in _assets.values()}
+
+
+def asset_url(name: str) -> str:
+    return f"/static/{_assets[name].url_name}"
+
+
+def asset_text(name: str) -> str:
+    return _assets[name].text
+
+
+def find_asset(url_name: str) -> StaticAsset | None:
+    return _by_url_name.get(url_name)
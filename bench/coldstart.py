@@ -0,0 +1,64 @@
+"""Cold-start check: import time of main, time until /ready, first request latency.
+
+    python bench/coldstart.py --runs 5 --max-import-seconds 1.0
+
+Uses the same local stubs as bench/loadtest.py, so no real quota is spent.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from loadtest import REPO_DIR, add_stub_arguments, start_servers
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def measure_import(cache_dir: str) -> float:
+    env = dict(os.environ, GOOGLE_MAPS_API_KEY="bench", OPENWEATHER_API_KEY="bench", GEMINI_KEY="bench", CACHE_DIRECTORY=cache_dir)
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=REPO_DIR, env=env, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-seconds", type=float, help="exit non-zero if the median import time exceeds this")
+    parser.add_argument("--show-logs", action="store_true")
+    parser.add_argument("--workers", type=int, default=1)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="justrip-coldstart-") as cache_dir:
+        imports = [measure_import(cache_dir) for _ in range(args.runs)]
+
+        started = time.perf_counter()
+        app_url, _, processes = start_servers(args, cache_dir)
+        try:
+            ready_after = time.perf_counter() - started
+            readiness = httpx.get(f"{app_url}/ready").json()
+            first_started = time.perf_counter()
+            status = httpx.get(f"{app_url}/weather/json", params={"loc": "Seoul"}, timeout=60).status_code
+            first_request = time.perf_counter() - first_started
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+                process.wait(timeout=10)
+
+    median_import = statistics.median(imports)
+    print(f"import main:      median {median_import * 1000:.0f} ms, max {max(imports) * 1000:.0f} ms over {len(imports)} runs")
+    print(f"spawn to /ready:  {ready_after * 1000:.0f} ms (warm-up {readiness['warmup_seconds']} s)")
+    print(f"first request:    {first_request * 1000:.0f} ms (HTTP {status})")
+    if args.max_import_seconds is not None and median_import > args.max_import_seconds:
+        print(f"import time above {args.max_import_seconds} s", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Offline load test: replays a request corpus against the app backed by local stubs.
+
+    python bench/loadtest.py --concurrency 1,8,32 --requests 200
+
+Starts bench/stubs.py and `uvicorn main:app` on local ports (unless --app-url
+is given), then for each concurrency level reports p50/p95/p99 latency,
+requests/sec, the error count and upstream calls per request.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+DEFAULT_CORPUS = BENCH_DIR / "corpus.txt"
+ENDPOINTS = ("/weather", "/weather/json", "/weather/text")
+
+sys.path.insert(0, str(BENCH_DIR))
+from stubs import UPSTREAMS, add_stub_arguments  # noqa: E402
+
+
+def load_corpus(path: Path) -> list[list[tuple[str, str]]]:
+    # One request per line: "location | budget_krw | interest, interest".
+    entries = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        fields = [field.strip() for field in line.split("|")]
+        params = [("loc", fields[0])]
+        if len(fields) > 1 and fields[1]:
+            params.append(("budget_krw", fields[1]))
+        if len(fields) > 2:
+            params.extend(("interests", interest.strip()) for interest in fields[2].split(",") if interest.strip())
+        entries.append(params)
+    return entries
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def stub_argv(args) -> list[str]:
+    argv = [
+        "--latency", args.latency,
+        "--latency-sigma", str(args.latency_sigma),
+        "--error-rate", args.error_rate,
+        "--recommendations", str(args.recommendations),
+        "--description-chars", str(args.description_chars),
+        "--stream-chunk-chars", str(args.stream_chunk_chars),
+    ]
+    if args.seed is not None:
+        argv += ["--seed", str(args.seed)]
+    return argv
+
+
+def start_servers(args, cache_dir: str) -> tuple[str, str, list[subprocess.Popen]]:
+    stub_port, app_port = free_port(), free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+
+    stubs = subprocess.Popen([sys.executable, str(BENCH_DIR / "stubs.py"), "--port", str(stub_port)] + stub_argv(args))
+    processes = [stubs]
+    wait_until_up(f"{stub_url}/__stats", stubs)
+
+    env = dict(os.environ)
+    env.update({
+        "GOOGLE_MAPS_API_KEY": "bench",
+        "OPENWEATHER_API_KEY": "bench",
+        "GEMINI_KEY": "bench",
+        "GEOCODE_URL": f"{stub_url}/maps/api/geocode/json",
+        "WEATHER_URL": f"{stub_url}/data/2.5/weather",
+        "FORECAST_URL": f"{stub_url}/data/2.5/forecast",
+        "GEMINI_API_BASE": f"{stub_url}/v1beta",
+        "CACHE_DIRECTORY": cache_dir,
+    })
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port), "--log-level", "warning",
+         "--workers", str(args.workers)],
+        cwd=REPO_DIR,
+        env=env,
+        stdout=None if args.show_logs else subprocess.DEVNULL,
+        stderr=None if args.show_logs else subprocess.DEVNULL,
+    )
+    processes.append(app)
+    wait_until_up(f"{app_url}/ready", app)
+    return app_url, stub_url, processes
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def upstream_calls(client: httpx.AsyncClient, stub_url: str | None) -> dict[str, int]:
+    if not stub_url:
+        return {}
+    return (await client.get(f"{stub_url}/__stats")).json()["calls"]
+
+
+async def run_level(client: httpx.AsyncClient, app_url: str, stub_url: str | None, corpus: list[list[tuple[str, str]]],
+                    endpoints: list[str], concurrency: int, total: int, no_cache: bool) -> dict:
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < total:
+            i = next_index
+            next_index += 1
+            params = list(corpus[i % len(corpus)])
+            if no_cache:
+                params.append(("no_cache", "true"))
+            endpoint = endpoints[i % len(endpoints)]
+            start = time.perf_counter()
+            try:
+                response = await client.get(f"{app_url}{endpoint}", params=params)
+                await response.aread()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code >= 500:
+                errors += 1
+
+    before = await upstream_calls(client, stub_url)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    after = await upstream_calls(client, stub_url)
+
+    latencies.sort()
+    done = len(latencies) or 1
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "errors": errors,
+        "statuses": statuses,
+        "upstream_calls_per_request": {name: round((after.get(name, 0) - before.get(name, 0)) / done, 3) for name in after},
+    }
+
+
+def print_report(results: list[dict]):
+    upstream_names = [name for name in UPSTREAMS if any(name in r["upstream_calls_per_request"] for r in results)]
+    header = f"{'conc':>5} {'reqs':>6} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+    header += "".join(f" {name + '/req':>11}" for name in upstream_names)
+    print(header)
+    for r in results:
+        line = f"{r['concurrency']:>5} {r['requests']:>6} {r['rps']:>9.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['errors']:>7}"
+        line += "".join(f" {r['upstream_calls_per_request'].get(name, 0):>11.3f}" for name in upstream_names)
+        print(line)
+
+
+async def run(args, app_url: str, stub_url: str | None) -> list[dict]:
+    corpus = load_corpus(Path(args.corpus))
+    if not corpus:
+        raise SystemExit(f"{args.corpus} has no requests")
+    endpoints = args.endpoints.split(",")
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        if args.warmup:
+            await run_level(client, app_url, stub_url, corpus, endpoints, 4, min(len(corpus), args.warmup), args.no_cache)
+        return [
+            await run_level(client, app_url, stub_url, corpus, endpoints, concurrency, args.requests, args.no_cache)
+            for concurrency in (int(c) for c in args.concurrency.split(","))
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS))
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated paths, used round-robin")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=0, help="requests to send before measuring")
+    parser.add_argument("--no-cache", action="store_true", help="send no_cache=true so every request reaches the stubs")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the app")
+    parser.add_argument("--show-logs", action="store_true", help="pass the app's log output through")
+    parser.add_argument("--app-url", help="benchmark an already running app instead of starting one")
+    parser.add_argument("--stub-url", help="stats URL base of already running stubs, used with --app-url")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="exit non-zero if any level's p95 exceeds this")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    processes = []
+    with tempfile.TemporaryDirectory(prefix="justrip-bench-") as cache_dir:
+        try:
+            if args.app_url:
+                app_url, stub_url = args.app_url.rstrip("/"), args.stub_url
+            else:
+                app_url, stub_url, processes = start_servers(args, cache_dir)
+            results = asyncio.run(run(args, app_url, stub_url))
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    print_report(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if args.max_p95_ms is not None and any(r["p95_ms"] > args.max_p95_ms for r in results):
+        print(f"p95 above {args.max_p95_ms} ms", file=sys.stderr)
+        sys.exit(1)
+    if any(r["errors"] for r in results) and not args.error_rate:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
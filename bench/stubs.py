@@ -0,0 +1,197 @@
+"""Local stand-ins for the Geocoding, OpenWeather and Gemini APIs.
+
+Run with `python bench/stubs.py --port 9100` and point the app at it with
+GEOCODE_URL, WEATHER_URL, FORECAST_URL and GEMINI_API_BASE (bench/loadtest.py
+does this).
+Latency, error rate and response size are configurable per upstream.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import zlib
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+UPSTREAMS = ("maps", "weather", "gemini")
+
+# Defaults roughly follow what the real services answer from Seoul.
+DEFAULT_LATENCY_MS = {"maps": 80.0, "weather": 60.0, "gemini": 2500.0}
+
+_NUMBERED_LINE = re.compile(r"(?m)^\d+\. ")
+
+
+class StubConfig:
+    def __init__(self, latency_ms: dict[str, float], sigma: float, error_rate: dict[str, float],
+                 recommendations: int, description_chars: int, stream_chunk_chars: int, seed: int | None):
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.recommendations = recommendations
+        self.description_chars = description_chars
+        self.stream_chunk_chars = stream_chunk_chars
+        self.random = random.Random(seed)
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI()
+    calls = {name: 0 for name in UPSTREAMS}
+    errors = {name: 0 for name in UPSTREAMS}
+
+    async def simulate(name: str) -> Response | None:
+        # Lognormal around the configured median, the usual shape of API latency.
+        calls[name] += 1
+        median = config.latency_ms[name]
+        if median > 0:
+            await asyncio.sleep(median * config.random.lognormvariate(0, config.sigma) / 1000)
+        if config.random.random() < config.error_rate[name]:
+            errors[name] += 1
+            return JSONResponse({"error": {"code": 503, "message": "stub upstream error"}}, status_code=503)
+        return None
+
+    def place(seed: str, i: int) -> dict:
+        return {
+            "name": f"{seed} spot {i}",
+            "location": f"{i} Stub-ro, {seed}",
+            "travel_time": f"{5 + i} min",
+            "description": ("Stub description. " * (config.description_chars // 18 + 1))[:config.description_chars],
+            "website": f"example.com/{i}",
+            "cost_krw": 5000 * i,
+            "cost_usd": round(5000 * i * 0.00073, 2),
+            "recommended_clothing": "Light jacket",
+            "recommended_essentials": "Water",
+        }
+
+    def places(seed: str) -> list[dict]:
+        return [place(seed, i) for i in range(config.recommendations)]
+
+    @app.get("/maps/api/geocode/json")
+    async def geocode(address: str = ""):
+        error = await simulate("maps")
+        if error:
+            return error
+        if not address.strip() or address.lower().startswith("nowhere"):
+            return {"status": "ZERO_RESULTS", "results": []}
+        # Deterministic coordinates so repeated addresses land in the same weather cell.
+        h = zlib.crc32(address.lower().encode())
+        lat = 33.0 + (h % 5000) / 1000
+        lon = 126.0 + (h // 5000 % 3000) / 1000
+        return {
+            "status": "OK",
+            "results": [{"formatted_address": address.title(), "geometry": {"location": {"lat": lat, "lng": lon}}}],
+        }
+
+    @app.get("/data/2.5/weather")
+    async def weather(lat: float = 0.0, lon: float = 0.0):
+        error = await simulate("weather")
+        if error:
+            return error
+        return {
+            "cod": 200,
+            "coord": {"lat": lat, "lon": lon},
+            "main": {"temp": round(10 + (lat * 7 + lon) % 20, 1), "humidity": 55},
+            "weather": [{"description": "scattered clouds"}],
+        }
+
+    @app.get("/data/2.5/forecast")
+    async def forecast(lat: float = 0.0, lon: float = 0.0):
+        error = await simulate("weather")
+        if error:
+            return error
+        base = int(time.time()) // 10800 * 10800
+        return {
+            "cod": "200",
+            "city": {"timezone": 32400, "coord": {"lat": lat, "lon": lon}},
+            "list": [
+                {"dt": base + 10800 * i, "main": {"temp": 12 + i % 8, "humidity": 60}, "weather": [{"description": "light rain" if i % 5 == 0 else "clear sky"}]}
+                for i in range(40)
+            ],
+        }
+
+    @app.post("/v1beta/models/{model_action}")
+    async def gemini(model_action: str, request: Request):
+        error = await simulate("gemini")
+        if error:
+            return error
+        body = await request.json()
+        prompt = "".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+        seed = "Stub City"
+        schema = (body.get("generationConfig") or {}).get("responseSchema") or {}
+        if "index" in (schema.get("items") or {}).get("properties", {}):
+            count = len(_NUMBERED_LINE.findall(prompt))
+            text = json.dumps([{"index": i, "recommendations": places(f"{seed} {i}")} for i in range(count)])
+        else:
+            text = json.dumps(places(seed))
+
+        if model_action.endswith(":streamGenerateContent"):
+            size = config.stream_chunk_chars
+
+            async def events():
+                for start in range(0, len(text), size):
+                    chunk = {"candidates": [{"content": {"parts": [{"text": text[start:start + size]}]}}]}
+                    yield f"data: {json.dumps(chunk)}\r\n\r\n"
+                    await asyncio.sleep(0)
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+        return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}]}
+
+    @app.get("/__stats")
+    async def stats():
+        return {"calls": calls, "errors": errors}
+
+    return app
+
+
+def _per_upstream(value: str, defaults: dict[str, float]) -> dict[str, float]:
+    # "2500" applies to every upstream; "maps=80,gemini=1200" overrides some.
+    result = dict(defaults)
+    for part in filter(None, (p.strip() for p in value.split(","))):
+        if "=" in part:
+            name, number = part.split("=", 1)
+            if name not in UPSTREAMS:
+                raise argparse.ArgumentTypeError(f"unknown upstream {name!r}")
+            result[name] = float(number)
+        else:
+            result = {name: float(part) for name in UPSTREAMS}
+    return result
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", default="", help="median latency in ms, e.g. 'gemini=1200,maps=50' or '0'")
+    parser.add_argument("--latency-sigma", type=float, default=0.4, help="lognormal sigma of the latency")
+    parser.add_argument("--error-rate", default="", help="fraction of 503s, e.g. 'gemini=0.02'")
+    parser.add_argument("--recommendations", type=int, default=5, help="places per Gemini answer")
+    parser.add_argument("--description-chars", type=int, default=300, help="length of each place description")
+    parser.add_argument("--stream-chunk-chars", type=int, default=64, help="text per streamed Gemini event")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args) -> StubConfig:
+    return StubConfig(
+        latency_ms=_per_upstream(args.latency, DEFAULT_LATENCY_MS),
+        sigma=args.latency_sigma,
+        error_rate=_per_upstream(args.error_rate, {name: 0.0 for name in UPSTREAMS}),
+        recommendations=args.recommendations,
+        description_chars=args.description_chars,
+        stream_chunk_chars=args.stream_chunk_chars,
+        seed=args.seed,
+    )
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import asyncio
+import contextvars
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+_NON_WORD_REGEX = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    # Folds case, width, punctuation and whitespace so "Seoul ", "seoul" and
+    # "SEOUL," share one cache entry.
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return _NON_WORD_REGEX.sub(" ", text).strip()
+
+
+class TTLCache:
+    # In-process LRU in front of an optional SQLite table. The SQLite file can
+    # be shared by every uvicorn worker on the host; each worker keeps its own
+    # memory tier. Values must be JSON-serializable (None is a valid value,
+    # which is how negative results are cached).
+
+    def __init__(self, name: str, max_entries: int = 1024, ttl: float = 3600.0,
+                 db_path: Path | None = None, max_rows: int = 100_000):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._writes_since_prune = 0
+        if db_path is not None:
+            try:
+                self._db = self._open_db(Path(db_path))
+            except sqlite3.Error as e:
+                logger.warning(f"{name} cache: disk tier disabled ({e})")
+
+    def _open_db(self, db_path: Path) -> sqlite3.Connection:
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(db_path, timeout=5, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        return db
+
+    def get(self, key: str, default=MISSING):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._memory[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None and row[1] > now:
+                        self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                        value = json.loads(row[0])
+                        self._remember(key, value, row[1])
+                        self.disk_hits += 1
+                        return value
+                except sqlite3.Error as e:
+                    logger.warning(f"{self.name} cache read failed: {e}")
+
+            self.misses += 1
+            return default
+
+    def ttl_remaining(self, key: str) -> float | None:
+        # Seconds until key expires, None if it is absent. Not counted as a lookup.
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[0] - now
+            if self._db is not None:
+                try:
+                    row = self._db.execute("SELECT expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+                    if row is not None and row[0] > now:
+                        return row[0] - now
+                except sqlite3.Error as e:
+                    logger.warning(f"{self.name} cache read failed: {e}")
+        return None
+
+    def set(self, key: str, value, ttl: float | None = None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), expires_at, time.time()),
+                )
+                self._writes_since_prune += 1
+                if self._writes_since_prune >= 256:
+                    self._prune()
+            except sqlite3.Error as e:
+                logger.warning(f"{self.name} cache write failed: {e}")
+
+    def _remember(self, key: str, value, expires_at: float):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _prune(self):
+        self._writes_since_prune = 0
+        self._db.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if count > self.max_rows:
+            self._db.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_rows,),
+            )
+            self.evictions += count - self.max_rows
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._memory),
+            "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+class StaleWhileRevalidateCache:
+    # Memory-only cache for upstream payloads that drift slowly. Within `ttl` an
+    # entry is served as fresh; for a further `stale_ttl` it is still served
+    # immediately while a single background task refreshes it.
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float, max_entries: int = 4096):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_failures = 0
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._refreshing: dict[str, asyncio.Task] = {}
+
+    async def get_or_fetch(self, key: str, fetch, should_cache=lambda value: True):
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if age < self.ttl + self.stale_ttl:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                if key not in self._refreshing:
+                    # The refresh outlives this request, so it must not inherit
+                    # the request's context (deadline, stage timings).
+                    task = asyncio.create_task(self._refresh(key, fetch, should_cache), context=contextvars.Context())
+                    self._refreshing[key] = task
+                return entry[1]
+
+        self.misses += 1
+        value = await fetch()
+        if should_cache(value):
+            self._store(key, value)
+        return value
+
+    def age(self, key: str) -> float | None:
+        entry = self._entries.get(key)
+        return None if entry is None else time.monotonic() - entry[0]
+
+    async def refresh(self, key: str, fetch, should_cache=lambda value: True):
+        # Refreshes key now, ahead of expiry, joining a refresh already running.
+        task = self._refreshing.get(key)
+        if task is None:
+            task = asyncio.create_task(self._refresh(key, fetch, should_cache), context=contextvars.Context())
+            self._refreshing[key] = task
+        await asyncio.shield(task)
+
+    async def _refresh(self, key: str, fetch, should_cache):
+        try:
+            value = await fetch()
+            if should_cache(value):
+                self._store(key, value)
+        except Exception as e:
+            self.refresh_failures += 1
+            logger.warning(f"{self.name} cache: background refresh of {key} failed: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    def _store(self, key: str, value):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refresh_failures": self.refresh_failures,
+            "entries": len(self._entries),
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,104 @@
+import array
+import bisect
+import datetime
+from collections import Counter
+from dataclasses import dataclass
+
+SECONDS_PER_DAY = 86400
+
+
+@dataclass(slots=True)
+class DayForecast:
+    date: datetime.date
+    temperature: float
+    description: str
+    humidity: float | None
+
+    def to_dict(self) -> dict:
+        return {
+            "date": self.date.isoformat(),
+            "temperature_celsius": self.temperature,
+            "description": self.description,
+            "humidity": self.humidity,
+        }
+
+
+class Forecast:
+    # One area's multi-day forecast (OpenWeather's 3-hourly slots) as parallel
+    # arrays ordered by time. Descriptions are interned, so a slot costs a few
+    # bytes; the conditions for any local date are sliced out with bisect.
+    __slots__ = ("times", "temperatures", "humidities", "descriptions", "vocabulary", "utc_offset")
+
+    def __init__(self, utc_offset: int = 0):
+        self.times = array.array("d")
+        self.temperatures = array.array("f")
+        # -1 where the slot has no humidity.
+        self.humidities = array.array("b")
+        self.descriptions = array.array("B")
+        self.vocabulary: list[str] = []
+        self.utc_offset = utc_offset
+
+    @classmethod
+    def from_payload(cls, data: dict) -> "Forecast":
+        # Raises KeyError, IndexError, TypeError or ValueError on a malformed payload.
+        forecast = cls(int((data.get("city") or {}).get("timezone") or 0))
+        interned: dict[str, int] = {}
+        for slot in sorted(data["list"], key=lambda slot: slot["dt"]):
+            description = slot["weather"][0]["description"]
+            if description not in interned:
+                interned[description] = len(forecast.vocabulary)
+                forecast.vocabulary.append(description)
+            humidity = slot["main"].get("humidity")
+            forecast.times.append(float(slot["dt"]))
+            forecast.temperatures.append(float(slot["main"]["temp"]))
+            forecast.humidities.append(-1 if humidity is None else int(humidity))
+            forecast.descriptions.append(interned[description])
+        if not forecast.times:
+            raise ValueError("forecast has no time slots")
+        return forecast
+
+    def _local_date(self, timestamp: float) -> datetime.date:
+        return datetime.datetime.fromtimestamp(timestamp + self.utc_offset, datetime.timezone.utc).date()
+
+    def today(self) -> datetime.date:
+        return self._local_date(datetime.datetime.now(datetime.timezone.utc).timestamp())
+
+    def last_date(self) -> datetime.date:
+        return self._local_date(self.times[-1])
+
+    def day(self, date: datetime.date) -> DayForecast | None:
+        start = datetime.datetime(date.year, date.month, date.day, tzinfo=datetime.timezone.utc).timestamp() - self.utc_offset
+        first = bisect.bisect_left(self.times, start)
+        last = bisect.bisect_left(self.times, start + SECONDS_PER_DAY)
+        if first == last:
+            return None
+        temperatures = self.temperatures[first:last]
+        humidities = [value for value in self.humidities[first:last] if value >= 0]
+        description = Counter(self.descriptions[first:last]).most_common(1)[0][0]
+        return DayForecast(
+            date=date,
+            temperature=round(sum(temperatures) / len(temperatures), 1),
+            description=self.vocabulary[description],
+            humidity=round(sum(humidities) / len(humidities)) if humidities else None,
+        )
+
+    def span(self, start: datetime.date, end: datetime.date) -> list[DayForecast]:
+        # The days in [start, end] the forecast reaches; missing days are left out.
+        days = []
+        date = start
+        while date <= end:
+            conditions = self.day(date)
+            if conditions is not None:
+                days.append(conditions)
+            date += datetime.timedelta(days=1)
+        return days
+
+
+def summarize(days: list[DayForecast]) -> tuple[float, str, float | None]:
+    # One (temperature, description, humidity) for a multi-day trip.
+    humidities = [day.humidity for day in days if day.humidity is not None]
+    return (
+        round(sum(day.temperature for day in days) / len(days), 1),
+        Counter(day.description for day in days).most_common(1)[0][0],
+        round(sum(humidities) / len(humidities)) if humidities else None,
+    )
@@ -0,0 +1,223 @@
+import array
+import gzip
+import logging
+from pathlib import Path
+
+from cache import normalize_text
+from itinerary import distance_km
+
+logger = logging.getLogger(__name__)
+
+# Population added to every candidate before comparing them, so two villages
+# sharing a name stay ambiguous while Seoul easily beats a hamlet called Seoul.
+POPULATION_PRIOR = 1000
+ALTERNATE_NAME_WEIGHT = 0.9
+UNVERIFIED_CONTEXT_WEIGHT = 0.5
+# A trailing address part such as ", Seoul" supports a candidate when a place
+# of that name lies within this distance of it.
+CONTEXT_RADIUS_KM = 60.0
+FUZZY_MIN_SIMILARITY = 0.6
+FUZZY_MAX_POSTINGS = 5000
+
+
+def _trigrams(key: str) -> set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _rows(path: Path):
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip() and not line.startswith("#"):
+                yield line.rstrip("\n").split("\t")
+
+
+class Gazetteer:
+    # Offline place-name index. Coordinates and populations live in flat
+    # arrays indexed by entry id; names map to arrays of ids, and a trigram
+    # index over primary names catches near misses like "Gyeong-ju".
+    #
+    # Accepts GeoNames dumps (cities15000.txt and friends, optionally .gz) or
+    # a simple TSV of "name, lat, lon[, country[, population[, alternate,names]]]".
+    # A country table (GeoNames countryInfo.txt, or a TSV of "code, name[,
+    # alternate,names]") lets "Seoul, South Korea" corroborate a KR entry and
+    # spells countries out in formatted addresses.
+
+    def __init__(self):
+        self.names: list[str] = []
+        self.countries: list[str] = []
+        self.feature_classes = bytearray()
+        self.lats = array.array("d")
+        self.lons = array.array("d")
+        self.populations = array.array("q")
+        self._primary: dict[str, array.array] = {}
+        self._alternate: dict[str, array.array] = {}
+        self._trigrams: dict[str, array.array] = {}
+        self.country_names: dict[str, str] = {}
+        self._country_codes: dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.low_confidence = 0
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @classmethod
+    def load(cls, path: Path, countries_path: Path | None = None) -> "Gazetteer":
+        # Without countries_path, a countryInfo.txt next to the dump is used
+        # if there is one.
+        gazetteer = cls()
+        path = Path(path)
+        skipped = 0
+        for cols in _rows(path):
+            try:
+                gazetteer._add_line(cols)
+            except (ValueError, IndexError):
+                skipped += 1
+        gazetteer._freeze()
+        logger.info(f"Loaded gazetteer {path} with {len(gazetteer)} places ({skipped} malformed lines skipped)")
+        if countries_path is None and (path.parent / "countryInfo.txt").exists():
+            countries_path = path.parent / "countryInfo.txt"
+        if countries_path is not None:
+            for cols in _rows(Path(countries_path)):
+                if len(cols) >= 5:
+                    # GeoNames: ISO, ISO3, ISO-numeric, fips, name, ...
+                    gazetteer.add_country(cols[0], cols[4], [cols[1]])
+                elif len(cols) >= 2:
+                    gazetteer.add_country(cols[0], cols[1], cols[2].split(",") if len(cols) > 2 else [])
+            logger.info(f"Loaded {len(gazetteer.country_names)} countries from {countries_path}")
+        return gazetteer
+
+    def _add_line(self, cols: list[str]):
+        if len(cols) >= 15:
+            # GeoNames: id, name, asciiname, alternatenames, lat, lon, class, code, country, ..., population
+            alternates = [cols[2]] + cols[3].split(",")
+            self.add(cols[1], float(cols[4]), float(cols[5]), cols[8], int(cols[14] or 0), cols[6] or "P", alternates)
+        else:
+            cols += [""] * (6 - len(cols))
+            self.add(cols[0], float(cols[1]), float(cols[2]), cols[3], int(cols[4] or 0), "P", cols[5].split(","))
+
+    def add(self, name: str, lat: float, lon: float, country: str = "", population: int = 0,
+            feature_class: str = "P", alternates: list[str] = []):
+        key = normalize_text(name)
+        if not key:
+            return
+        entry_id = len(self.names)
+        self.names.append(name)
+        self.countries.append(country)
+        self.feature_classes.append(ord(feature_class[0]))
+        self.lats.append(lat)
+        self.lons.append(lon)
+        self.populations.append(population)
+        self._primary.setdefault(key, array.array("I")).append(entry_id)
+        for trigram in _trigrams(key):
+            self._trigrams.setdefault(trigram, array.array("I")).append(entry_id)
+        for alternate in {normalize_text(a) for a in alternates} - {key, ""}:
+            self._alternate.setdefault(alternate, array.array("I")).append(entry_id)
+
+    def add_country(self, code: str, name: str, alternates: list[str] = []):
+        code = code.strip().upper()
+        if not code or not name.strip():
+            return
+        self.country_names[code] = name.strip()
+        for alias in {normalize_text(a) for a in [code, name, *alternates]} - {""}:
+            self._country_codes[alias] = code
+
+    def country_name(self, code: str) -> str:
+        return self.country_names.get(code, code)
+
+    def _freeze(self):
+        # Trigrams shared by thousands of names say nothing about a match;
+        # dropping them bounds the fuzzy scan.
+        self._trigrams = {t: ids for t, ids in self._trigrams.items() if len(ids) <= FUZZY_MAX_POSTINGS}
+
+    def _candidates(self, key: str) -> list[tuple[int, float]]:
+        candidates = {entry_id: 1.0 for entry_id in self._primary.get(key, ())}
+        for entry_id in self._alternate.get(key, ()):
+            candidates.setdefault(entry_id, ALTERNATE_NAME_WEIGHT)
+        if candidates:
+            return list(candidates.items())
+
+        query = _trigrams(key)
+        shared: dict[int, int] = {}
+        for trigram in query:
+            for entry_id in self._trigrams.get(trigram, ()):
+                shared[entry_id] = shared.get(entry_id, 0) + 1
+        fuzzy = []
+        min_shared = FUZZY_MIN_SIMILARITY * len(query)
+        for entry_id, count in shared.items():
+            if count < min_shared:
+                continue
+            similarity = count / len(query | _trigrams(normalize_text(self.names[entry_id])))
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                fuzzy.append((entry_id, similarity))
+        return fuzzy
+
+    def _supports(self, entry_id: int, part: str) -> bool:
+        country = self.countries[entry_id]
+        if part == country.casefold() or part == normalize_text(country):
+            return True
+        if self._country_codes.get(part) == country:
+            return True
+        lat, lon = self.lats[entry_id], self.lons[entry_id]
+        for ids in (self._primary.get(part, ()), self._alternate.get(part, ())):
+            for other in ids:
+                if other == entry_id:
+                    continue
+                # Country and admin-area rows (GeoNames class A) vouch by country.
+                if self.feature_classes[other] == ord("A") and self.countries[other] == country:
+                    return True
+                if distance_km(lat, lon, self.lats[other], self.lons[other]) <= CONTEXT_RADIUS_KM:
+                    return True
+        return False
+
+    def lookup(self, query: str) -> tuple[float, float, str, float] | None:
+        # Returns (lat, lon, formatted_address, confidence) for the best match.
+        # The first comma-separated part is the place name; the rest must be
+        # corroborated by the index or the confidence is cut accordingly.
+        parts = [p for p in (normalize_text(part) for part in query.split(",")) if p]
+        if not parts:
+            return None
+        candidates = self._candidates(parts[0])
+        if not candidates:
+            return None
+
+        context = parts[1:]
+        scored = []
+        for entry_id, weight in candidates:
+            for part in context:
+                if not self._supports(entry_id, part):
+                    weight *= UNVERIFIED_CONTEXT_WEIGHT
+            scored.append((entry_id, weight))
+        best_weight = max(weight for _, weight in scored)
+        # Only candidates as well supported as the best compete on population.
+        pool = [(entry_id, weight) for entry_id, weight in scored if weight >= best_weight * 0.999]
+        priors = [self.populations[entry_id] + POPULATION_PRIOR for entry_id, _ in pool]
+        best = max(range(len(pool)), key=priors.__getitem__)
+        entry_id, weight = pool[best]
+        confidence = priors[best] / sum(priors) * weight
+
+        name, country = self.names[entry_id], self.countries[entry_id]
+        # Google's style: "Seoul, South Korea" rather than "Seoul, KR".
+        formatted_address = f"{name}, {self.country_name(country)}" if country else name
+        return self.lats[entry_id], self.lons[entry_id], formatted_address, confidence
+
+    def resolve(self, query: str, min_confidence: float) -> tuple[float, float, str] | None:
+        match = self.lookup(query)
+        if match is None:
+            self.misses += 1
+            return None
+        if match[3] < min_confidence:
+            self.low_confidence += 1
+            return None
+        self.hits += 1
+        return match[:3]
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "low_confidence": self.low_confidence,
+            "entries": len(self.names),
+        }
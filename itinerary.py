@@ -0,0 +1,115 @@
+import math
+import os
+
+from recommendation import Recommendation
+
+# numpy is imported on first use (or by warm_up) to keep worker start-up fast.
+np = None
+
+EARTH_DIAMETER_KM = 12742.0
+# Straight-line distance times this approximates the street distance.
+ITINERARY_DETOUR_FACTOR = float(os.getenv("ITINERARY_DETOUR_FACTOR", "1.3"))
+ITINERARY_WALK_KMH = float(os.getenv("ITINERARY_WALK_KMH", "4.5"))
+ITINERARY_WALK_MAX_KM = float(os.getenv("ITINERARY_WALK_MAX_KM", "1.5"))
+ITINERARY_TRANSIT_KMH = float(os.getenv("ITINERARY_TRANSIT_KMH", "25"))
+# Waiting and walking to the stop, added to every non-walking leg.
+ITINERARY_TRANSIT_OVERHEAD_MIN = float(os.getenv("ITINERARY_TRANSIT_OVERHEAD_MIN", "10"))
+ITINERARY_MAX_2OPT_PASSES = int(os.getenv("ITINERARY_MAX_2OPT_PASSES", "8"))
+
+
+def _numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def warm_up():
+    plan_itinerary(0.0, 0.0, [Recommendation(lat=0.01, lon=0.01), Recommendation(lat=0.02, lon=0.0)])
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    # Great-circle distance between two points, without numpy.
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_DIAMETER_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def distance_matrix(lats, lons) -> "np.ndarray":
+    # Great-circle distances in km between every pair of points, in one pass.
+    _numpy()
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return EARTH_DIAMETER_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest_neighbour_route(dist: "np.ndarray", start: int = 0) -> "np.ndarray":
+    _numpy()
+    n = len(dist)
+    route = np.empty(n, dtype=np.intp)
+    visited = np.zeros(n, dtype=bool)
+    current = start
+    for position in range(n):
+        route[position] = current
+        visited[current] = True
+        if position == n - 1:
+            break
+        current = int(np.argmin(np.where(visited, np.inf, dist[current])))
+    return route
+
+
+def two_opt(route: "np.ndarray", dist: "np.ndarray", max_passes: int = ITINERARY_MAX_2OPT_PASSES) -> "np.ndarray":
+    # Open path with a fixed first stop (the traveller). For each i, the gain
+    # of reversing route[i:j+1] is computed for every j at once.
+    _numpy()
+    route = route.copy()
+    n = len(route)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, n - 1):
+            a, b = route[i - 1], route[i]
+            ends = route[i + 1:]
+            following = route[i + 2:]
+            removed = dist[a, b] + np.append(dist[ends[:-1], following], 0.0)
+            added = dist[a, ends] + np.append(dist[b, following], 0.0)
+            gain = removed - added
+            k = int(np.argmax(gain))
+            if gain[k] > 1e-9:
+                j = i + 1 + k
+                route[i:j + 1] = route[i:j + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    return route
+
+
+def estimate_minutes(road_km: float) -> float:
+    if road_km <= ITINERARY_WALK_MAX_KM:
+        return road_km / ITINERARY_WALK_KMH * 60
+    return road_km / ITINERARY_TRANSIT_KMH * 60 + ITINERARY_TRANSIT_OVERHEAD_MIN
+
+
+def plan_itinerary(lat: float, lon: float, recommendations: list[Recommendation]) -> list[Recommendation]:
+    # Orders the geocoded places into a short walk starting at (lat, lon) and
+    # records each leg on the item. Places without coordinates keep their
+    # model order at the end.
+    located = [item for item in recommendations if item.lat is not None and item.lon is not None]
+    unlocated = [item for item in recommendations if item.lat is None or item.lon is None]
+    if not located:
+        return list(recommendations)
+
+    dist = distance_matrix([lat] + [item.lat for item in located], [lon] + [item.lon for item in located])
+    route = two_opt(nearest_neighbour_route(dist), dist)
+
+    ordered = []
+    for previous, stop in zip(route[:-1], route[1:]):
+        item = located[stop - 1]
+        road_km = float(dist[previous, stop]) * ITINERARY_DETOUR_FACTOR
+        item.leg_km = round(road_km, 2)
+        item.leg_minutes = round(estimate_minutes(road_km))
+        ordered.append(item)
+    return ordered + unlocated
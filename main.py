@@ -1,51 +1,287 @@
-from fastapi import FastAPI, Query
-from fastapi.responses import HTMLResponse, PlainTextResponse, JSONResponse
+import time
+
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse, JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from contextlib import asynccontextmanager
+import datetime
 import os
-import requests
 from dotenv import load_dotenv
-import google.generativeai as genai
+
+# Before the local modules below, which read their settings at import time.
+load_dotenv()
+
+import upstream
+import metrics
+import resilience
+import admission
+from cache import MISSING, StaleWhileRevalidateCache, TTLCache, normalize_text
+from singleflight import SingleFlight
+from gazetteer import Gazetteer
+from forecast import Forecast, summarize
+import itinerary
+from itinerary import plan_itinerary
+from streamparse import JSONArrayStreamParser
+from recommendation import BATCH_RESPONSE_SCHEMA, PARSE_STATS, RESPONSE_SCHEMA, Recommendation, dumps, loads, parse_ai_response, parse_batch_response
+from trip import EXCHANGE_RATE_KRW_TO_USD, TripError, TripResult
+from render import COMPACT_FIELDS, html_escape, parse_compact_fields, render_compact, render_html, render_json, render_text
+from assets import IMMUTABLE_CACHE_CONTROL, find_asset
+from compression import COMPRESSION_MIN_BYTES, accepts, choose_encoding, compress
+from reportstore import ReportStore
+from poistore import PlaceStore
+from prewarm import PREWARM_REFRESH_AHEAD, Prewarmer
+import gzip
+import hashlib
+import httpx
+import asyncio
+import math
 import re
 import logging
 from pathlib import Path
-from datetime import datetime
 import json
 
 logging.basicConfig(level=logging.INFO)
+# httpx logs every request URL at INFO, and the Maps and OpenWeather keys
+# travel in the query string.
+logging.getLogger("httpx").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    report_store.start()
+    warmup_task = asyncio.create_task(warm_up())
+    prewarmer.start()
+    yield
+    warmup_task.cancel()
+    await prewarmer.close()
+    await report_store.close()
+    await upstream.close_clients()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(metrics.ServerTimingMiddleware)
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 WEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_KEY")
 
-EXCHANGE_RATE_KRW_TO_USD = 0.00073
-SAVE_DIRECTORY = Path("saved_reports")
-
-URL_PROTOCOL_REGEX = re.compile(r'^(http|https)://', re.IGNORECASE)
+SAVE_DIRECTORY = Path(os.getenv("SAVE_DIRECTORY", "saved_reports"))
+
+# Overridable so the app can be pointed at local stand-ins (see bench/).
+GEOCODE_URL = os.getenv("GEOCODE_URL", "https://maps.googleapis.com/maps/api/geocode/json")
+WEATHER_URL = os.getenv("WEATHER_URL", "https://api.openweathermap.org/data/2.5/weather")
+FORECAST_URL = os.getenv("FORECAST_URL", "https://api.openweathermap.org/data/2.5/forecast")
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "models/gemini-2.5-flash")
+
+RECOMMENDATION_GEOCODE_CONCURRENCY = int(os.getenv("RECOMMENDATION_GEOCODE_CONCURRENCY", "5"))
+RECOMMENDATION_GEOCODE_TIMEOUT = float(os.getenv("RECOMMENDATION_GEOCODE_TIMEOUT", "3"))
+
+# Per-stage caps inside the overall REQUEST_DEADLINE (see resilience.py). The
+# Gemini stage leaves RECOMMENDATION_GEOCODE_TIMEOUT for the geocoding after it.
+GEOCODE_TIMEOUT = float(os.getenv("GEOCODE_TIMEOUT", "3"))
+WEATHER_TIMEOUT = float(os.getenv("WEATHER_TIMEOUT", "3"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "25"))
+# Send a second geocoding request if the first has not answered after this
+# many seconds; 0 disables hedging.
+GEOCODE_HEDGE_DELAY = float(os.getenv("GEOCODE_HEDGE_DELAY", "0"))
+GEOCODE_HEDGE_ATTEMPTS = int(os.getenv("GEOCODE_HEDGE_ATTEMPTS", "2"))
+
+CACHE_DIRECTORY = Path(os.getenv("CACHE_DIRECTORY", "cache"))
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))
+GEOCODE_NEGATIVE_CACHE_TTL = float(os.getenv("GEOCODE_NEGATIVE_CACHE_TTL", str(24 * 3600)))
+GEOCODE_CACHE_MEMORY_ENTRIES = int(os.getenv("GEOCODE_CACHE_MEMORY_ENTRIES", "4096"))
+GEOCODE_CACHE_DISK_ENTRIES = int(os.getenv("GEOCODE_CACHE_DISK_ENTRIES", "200000"))
+
+# Optional offline place index (GeoNames dump or simple TSV) tried before Google.
+# Loaded in the background after start-up; Google answers until it is ready.
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", "")
+# Country names for the gazetteer; defaults to a countryInfo.txt beside GAZETTEER_PATH.
+GAZETTEER_COUNTRIES_PATH = os.getenv("GAZETTEER_COUNTRIES_PATH", "")
+GAZETTEER_MIN_CONFIDENCE = float(os.getenv("GAZETTEER_MIN_CONFIDENCE", "0.8"))
+
+# Recommendation places already geocoded are reused when one of the same name
+# and address lies within PLACE_MATCH_RADIUS_KM of the trip's location.
+PLACE_MATCH_RADIUS_KM = float(os.getenv("PLACE_MATCH_RADIUS_KM", "30"))
+PLACE_NEARBY_RADIUS_KM = float(os.getenv("PLACE_NEARBY_RADIUS_KM", "5"))
+PLACE_NEARBY_LIMIT = int(os.getenv("PLACE_NEARBY_LIMIT", "10"))
+
+RECOMMENDATION_CACHE_TTL = float(os.getenv("RECOMMENDATION_CACHE_TTL", str(6 * 3600)))
+RECOMMENDATION_CACHE_MEMORY_ENTRIES = int(os.getenv("RECOMMENDATION_CACHE_MEMORY_ENTRIES", "1024"))
+RECOMMENDATION_CACHE_DISK_ENTRIES = int(os.getenv("RECOMMENDATION_CACHE_DISK_ENTRIES", "50000"))
+RECOMMENDATION_TEMPERATURE_BAND = float(os.getenv("RECOMMENDATION_TEMPERATURE_BAND", "5"))
+RECOMMENDATION_BUDGET_BAND_KRW = float(os.getenv("RECOMMENDATION_BUDGET_BAND_KRW", "10000"))
+
+# Gemini JSON mode: the model must answer with an array matching the schema,
+# so the response can be decoded directly without fence stripping.
+RECOMMENDATION_GENERATION_CONFIG = {
+    "responseMimeType": "application/json",
+    "responseSchema": RESPONSE_SCHEMA,
+}
+BATCH_GENERATION_CONFIG = {
+    "responseMimeType": "application/json",
+    "responseSchema": BATCH_RESPONSE_SCHEMA,
+}
+BATCH_MAX_LOCATIONS = int(os.getenv("BATCH_MAX_LOCATIONS", "50"))
+# Locations packed into one Gemini prompt; larger packs mean fewer calls but
+# longer generations and a bigger blast radius when one answer is malformed.
+BATCH_PROMPT_SIZE = int(os.getenv("BATCH_PROMPT_SIZE", "5"))
+
+# Whole-trip results and their rendered bodies are reused for this long, which
+# is also the max-age advertised to clients.
+TRIP_CACHE_TTL = float(os.getenv("TRIP_CACHE_TTL", "60"))
+TRIP_CACHE_ENTRIES = int(os.getenv("TRIP_CACHE_ENTRIES", "512"))
+RESPONSE_MAX_AGE = int(TRIP_CACHE_TTL)
+
+# Grid cell size in degrees; 0.05° is roughly 5 km, well inside the spatial
+# resolution of OpenWeather's current-conditions data.
+WEATHER_GRID_RESOLUTION = float(os.getenv("WEATHER_GRID_RESOLUTION", "0.05"))
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+WEATHER_CACHE_STALE_TTL = float(os.getenv("WEATHER_CACHE_STALE_TTL", "1800"))
+WEATHER_CACHE_ENTRIES = int(os.getenv("WEATHER_CACHE_ENTRIES", "4096"))
+
+# Dated trips read one multi-day forecast per coarser area, refreshed about as
+# often as OpenWeather updates it (every 3 hours).
+FORECAST_GRID_RESOLUTION = float(os.getenv("FORECAST_GRID_RESOLUTION", "0.1"))
+FORECAST_CACHE_TTL = float(os.getenv("FORECAST_CACHE_TTL", str(3 * 3600)))
+FORECAST_CACHE_STALE_TTL = float(os.getenv("FORECAST_CACHE_STALE_TTL", str(3 * 3600)))
+FORECAST_CACHE_ENTRIES = int(os.getenv("FORECAST_CACHE_ENTRIES", "2048"))
+FORECAST_MAX_DAYS = int(os.getenv("FORECAST_MAX_DAYS", "7"))
 
 if not all([GOOGLE_API_KEY, WEATHER_API_KEY, GEMINI_API_KEY]):
     raise EnvironmentError("Missing one or more required API keys in .env")
 
-genai.configure(api_key=GEMINI_API_KEY)
-
-def html_escape(text):
-    if text is None:
-        return ''
-    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;').replace("'", '&#39;')
-
-def get_ai_recommendation(loc: str, description: str, temperature: float, lat: float, lon: float, budget_krw: float = 0.0, interests: list[str] = []) -> str:
-    budget_usd = 0.0
-    if budget_krw > 0:
-        if EXCHANGE_RATE_KRW_TO_USD > 0:
-            budget_usd = budget_krw * EXCHANGE_RATE_KRW_TO_USD
-            budget_phrase = f"a budget of {budget_krw:,} KRW (approximately ${budget_usd:,.2f} USD)"
-        else:
-            budget_phrase = f"a budget of {budget_krw:,} KRW (unable to convert to USD)"
+geocode_cache = TTLCache(
+    "geocode",
+    max_entries=GEOCODE_CACHE_MEMORY_ENTRIES,
+    ttl=GEOCODE_CACHE_TTL,
+    db_path=CACHE_DIRECTORY / "geocode.sqlite3",
+    max_rows=GEOCODE_CACHE_DISK_ENTRIES,
+)
+recommendation_cache = TTLCache(
+    "recommendation",
+    max_entries=RECOMMENDATION_CACHE_MEMORY_ENTRIES,
+    ttl=RECOMMENDATION_CACHE_TTL,
+    db_path=CACHE_DIRECTORY / "recommendations.sqlite3",
+    max_rows=RECOMMENDATION_CACHE_DISK_ENTRIES,
+)
+
+weather_cache = StaleWhileRevalidateCache(
+    "weather",
+    ttl=WEATHER_CACHE_TTL,
+    stale_ttl=WEATHER_CACHE_STALE_TTL,
+    max_entries=WEATHER_CACHE_ENTRIES,
+)
+forecast_cache = StaleWhileRevalidateCache(
+    "forecast",
+    ttl=FORECAST_CACHE_TTL,
+    stale_ttl=FORECAST_CACHE_STALE_TTL,
+    max_entries=FORECAST_CACHE_ENTRIES,
+)
+gazetteer: Gazetteer | None = None
+place_store = PlaceStore(CACHE_DIRECTORY / "places.sqlite3")
+report_store = ReportStore(SAVE_DIRECTORY)
+trip_cache = TTLCache("trip", max_entries=TRIP_CACHE_ENTRIES, ttl=TRIP_CACHE_TTL)
+geocode_flight = SingleFlight("geocode")
+weather_flight = SingleFlight("weather")
+forecast_flight = SingleFlight("forecast")
+recommendation_flight = SingleFlight("recommendation")
+
+for _name, _source in (
+    ("geocode", geocode_cache), ("recommendation", recommendation_cache),
+    ("weather", weather_cache), ("forecast", forecast_cache), ("trip", trip_cache),
+):
+    metrics.register_stats("cache", _name, _source.stats)
+for _flight in (geocode_flight, weather_flight, forecast_flight, recommendation_flight):
+    metrics.register_stats("singleflight", _flight.name, _flight.stats)
+metrics.register_stats("ai_parse", "recommendations", lambda: PARSE_STATS)
+metrics.register_stats("reports", "saved", report_store.stats)
+metrics.register_stats("places", "known", place_store.stats)
+metrics.register_stats("hedge", "maps", lambda: resilience.HEDGE_STATS)
+for _upstream in upstream.UPSTREAMS:
+    resilience.breaker(_upstream)
+    admission.limit(_upstream)
+
+# Module import should stay well under this; it is what a new replica pays
+# before it can even start warming up.
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "1.0"))
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "10"))
+readiness = {"ready": False, "import_seconds": None, "warmup_seconds": None}
+metrics.register_stats("startup", "worker", lambda: {
+    "ready": int(readiness["ready"]),
+    "import_seconds": readiness["import_seconds"] or 0.0,
+    "warmup_seconds": readiness["warmup_seconds"] or 0.0,
+})
+
+
+async def warm_up():
+    # Everything a first request would otherwise pay for: loading the
+    # gazetteer, importing numpy, and connecting to each upstream.
+    global gazetteer
+    started = time.perf_counter()
+    if GAZETTEER_PATH:
+        try:
+            gazetteer = await asyncio.to_thread(Gazetteer.load, GAZETTEER_PATH, GAZETTEER_COUNTRIES_PATH or None)
+            metrics.register_stats("gazetteer", "places", gazetteer.stats)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load gazetteer {GAZETTEER_PATH}: {e}")
+    await asyncio.to_thread(itinerary.warm_up)
+    await asyncio.gather(
+        upstream.warm_client("maps", GEOCODE_URL, timeout=WARMUP_TIMEOUT),
+        upstream.warm_client("weather", WEATHER_URL, timeout=WARMUP_TIMEOUT),
+        upstream.warm_client("gemini", GEMINI_API_BASE, timeout=WARMUP_TIMEOUT),
+    )
+    readiness["warmup_seconds"] = round(time.perf_counter() - started, 3)
+    readiness["ready"] = True
+    logger.info(f"Worker ready: import {readiness['import_seconds']}s, warm-up {readiness['warmup_seconds']}s")
+
+RECOMMENDATION_KEYS_PROMPT = (
+    "Each object should have the following keys:\n"
+    "- `name`: (string) The name of the place or event.\n"
+    "- `location`: (string) The address or a general area that Google Maps can understand (e.g., '123 Main St, City, Country'). If unknown, use 'N/A'.\n"
+    "- `travel_time`: (string) Estimated travel time (e.g., '5-10 minutes walk', '20 minutes by bus'). If unknown, use 'N/A'.\n"
+    "- `description`: (string) A detailed description.\n"
+    "- `website`: (string) The official website URL (e.g., '[https://example.com](https://example.com)'). If no website, use 'N/A'.\n"
+    "- `cost_krw`: (number) Estimated cost in KRW. Use 0 for free. If unknown, use 0.\n"
+    "- `cost_usd`: (number) Estimated cost in USD. Use 0 for free. If unknown, use 0.\n"
+    "- `recommended_clothing`: (string) Specific clothing recommendation for this location/activity based on weather (e.g., 'Light t-shirt and shorts', 'Warm jacket and gloves').\n"
+    "- `recommended_essentials`: (string) Specific essential items for this location/activity (e.g., 'sunscreen, hat, water bottle', 'umbrella, comfortable walking shoes').\n"
+    "Ensure the cost fields are numeric. If the cost is a range, provide a reasonable average or the lower end.\n"
+)
+
+
+def _budget_phrase(budget_krw: float) -> str:
+    if budget_krw <= 0:
+        return "any budget"
+    if EXCHANGE_RATE_KRW_TO_USD > 0:
+        budget_usd = budget_krw * EXCHANGE_RATE_KRW_TO_USD
+        return f"a budget of {budget_krw:,} KRW (approximately ${budget_usd:,.2f} USD)"
+    return f"a budget of {budget_krw:,} KRW (unable to convert to USD)"
+
+
+def _dates_phrase(date: datetime.date, end_date: datetime.date | None) -> str:
+    if end_date is None or end_date == date:
+        return f"on {date.isoformat()}"
+    return f"from {date.isoformat()} to {end_date.isoformat()}"
+
+
+def build_recommendation_prompt(loc: str, description: str, temperature: float, lat: float, lon: float, budget_krw: float = 0.0, interests: list[str] = [], date: datetime.date | None = None, end_date: datetime.date | None = None) -> str:
+    budget_phrase = _budget_phrase(budget_krw)
+
+    if date is None:
+        conditions_phrase = (
+            f"The current weather in {loc} is {description} with a temperature of {temperature}°C.\n"
+            f"I am currently at coordinates ({lat}, {lon}). "
+        )
     else:
-        budget_phrase = "any budget"
+        dates_phrase = _dates_phrase(date, end_date)
+        conditions_phrase = (
+            f"The forecast for {loc} {dates_phrase} is {description} with a temperature of {temperature}°C.\n"
+            f"I will be at coordinates ({lat}, {lon}) {dates_phrase}. "
+        )
 
     interests_phrase = ""
     if interests:
@@ -53,23 +289,12 @@ def get_ai_recommendation(loc: str, description: str, temperature: float, lat: f
         interests_phrase = f"Also, consider my interests in: {interests_str}. "
 
     prompt = (
-        f"The current weather in {loc} is {description} with a temperature of {temperature}°C.\n"
-        f"I am currently at coordinates ({lat}, {lon}). "
+        f"{conditions_phrase}"
         f"Suggest 3 fun or useful things I can do near me in {loc}. Consider the temperature, I do not want to be outside if it is too hot or too cold. "
         f"Consider {budget_phrase}. {interests_phrase}"
         f"You must recommend events or places that are close to the budget provided. It does not have to be free.\n"
         f"Format your response as a JSON array of objects, where each object represents a recommendation.\n"
-        f"Each object should have the following keys:\n"
-        f"- `name`: (string) The name of the place or event.\n"
-        f"- `location`: (string) The address or a general area that Google Maps can understand (e.g., '123 Main St, City, Country'). If unknown, use 'N/A'.\n"
-        f"- `travel_time`: (string) Estimated travel time (e.g., '5-10 minutes walk', '20 minutes by bus'). If unknown, use 'N/A'.\n"
-        f"- `description`: (string) A detailed description.\n"
-        f"- `website`: (string) The official website URL (e.g., '[https://example.com](https://example.com)'). If no website, use 'N/A'.\n"
-        f"- `cost_krw`: (number) Estimated cost in KRW. Use 0 for free. If unknown, use 0.\n"
-        f"- `cost_usd`: (number) Estimated cost in USD. Use 0 for free. If unknown, use 0.\n"
-        f"- `recommended_clothing`: (string) Specific clothing recommendation for this location/activity based on weather (e.g., 'Light t-shirt and shorts', 'Warm jacket and gloves').\n"
-        f"- `recommended_essentials`: (string) Specific essential items for this location/activity (e.g., 'sunscreen, hat, water bottle', 'umbrella, comfortable walking shoes').\n"
-        f"Ensure the cost fields are numeric. If the cost is a range, provide a reasonable average or the lower end.\n"
+        f"{RECOMMENDATION_KEYS_PROMPT}"
         f"Example JSON structure:\n"
         f"```json\n"
         f"[\n"
@@ -88,36 +313,318 @@ def get_ai_recommendation(loc: str, description: str, temperature: float, lat: f
         f"```\n"
         f"Provide only the JSON. Do not include any conversational text outside the JSON block.\n"
     )
+    return prompt
+
+
+async def get_ai_recommendation(loc: str, description: str, temperature: float, lat: float, lon: float, budget_krw: float = 0.0, interests: list[str] = [], date: datetime.date | None = None, end_date: datetime.date | None = None) -> str:
+    prompt = build_recommendation_prompt(loc, description, temperature, lat, lon, budget_krw, interests, date, end_date)
     try:
-        model = genai.GenerativeModel(model_name="models/gemini-2.5-flash")
-        response = model.generate_content(prompt)
-        if hasattr(response, 'text') and isinstance(response.text, str):
-            json_match = re.search(r'```json\s*(.*?)\s*```', response.text.strip(), re.DOTALL)
-            if json_match:
-                return json_match.group(1).strip()
-            return response.text.strip()
+        text = await generate_content(prompt, RECOMMENDATION_GENERATION_CONFIG)
+        if isinstance(text, str):
+            return text.strip()
         else:
             return "AI response missing or not in expected format."
+    except (admission.Overloaded, resilience.UpstreamUnavailable):
+        # Backpressure and outages must reach the caller as 429/503, not
+        # as an empty recommendation list.
+        raise
     except Exception as e:
         logger.error(f"AI error: {str(e)}")
         return f"AI error: {str(e)}"
 
 
-def get_coordinates(location: str):
-    url = "https://maps.googleapis.com/maps/api/geocode/json"
+def recommendation_cache_key(formatted_address: str, description: str, temperature: float, budget_krw: float, interests: list[str], date: datetime.date | None = None, end_date: datetime.date | None = None) -> str:
+    # The prompt of a dated trip names its dates (and asks for events), so
+    # its answer is only reused for the same dates, as with trip_cache_key.
+    temperature_band = math.floor(temperature / RECOMMENDATION_TEMPERATURE_BAND)
+    budget_band = math.floor(budget_krw / RECOMMENDATION_BUDGET_BAND_KRW) if budget_krw > 0 else -1
+    interest_set = sorted({normalize_text(interest) for interest in interests if interest.strip()})
+    key = [normalize_text(formatted_address), normalize_text(description), temperature_band, budget_band, interest_set]
+    if date is not None:
+        key += [date.isoformat(), (end_date or date).isoformat()]
+    return json.dumps(key, ensure_ascii=False)
+
+
+async def get_recommendations(formatted_address: str, description: str, temperature: float, lat: float, lon: float, budget_krw: float = 0.0, interests: list[str] = [], date: datetime.date | None = None, end_date: datetime.date | None = None, use_cache: bool = True) -> tuple[list[Recommendation], str, bool]:
+    # The flag is True only for the caller whose call generated the items,
+    # not for cache hits or callers coalesced onto another's call.
+    cache_key = recommendation_cache_key(formatted_address, description, temperature, budget_krw, interests, date, end_date)
+    if use_cache:
+        cached = recommendation_cache.get(cache_key)
+        if cached is not MISSING:
+            return [Recommendation.from_row(row) for row in cached["items"]], cached["raw"], False
+    generated = False
+
+    async def fetch():
+        nonlocal generated
+        generated = True
+        with metrics.stage("gemini"):
+            ai_tip_raw = await get_ai_recommendation(formatted_address, description, temperature, lat, lon, budget_krw, interests, date, end_date)
+        with metrics.stage("parse"):
+            rows = [item.to_row() for item in parse_ai_response(ai_tip_raw)]
+        if rows:
+            recommendation_cache.set(cache_key, {"items": rows, "raw": ai_tip_raw})
+        return rows, ai_tip_raw
+
+    rows, ai_tip_raw = await recommendation_flight.do(cache_key, fetch)
+    return [Recommendation.from_row(row) for row in rows], ai_tip_raw, generated
+
+
+def build_batch_prompt(contexts: list[tuple]) -> str:
+    lines = []
+    for index, (loc, description, temperature, lat, lon, budget_krw, interests, date, end_date) in enumerate(contexts):
+        interests_phrase = f" Interests: {', '.join(interests)}." if interests else ""
+        conditions_phrase = "currently" if date is None else f"forecast {_dates_phrase(date, end_date)}:"
+        lines.append(
+            f"{index}. {loc} (coordinates {lat}, {lon}): {conditions_phrase} {description} with a temperature of {temperature}°C. "
+            f"Consider {_budget_phrase(budget_krw)}.{interests_phrase}\n"
+        )
+    return (
+        f"I am planning trips to several places. For each numbered location below, suggest 3 fun or useful things to do nearby. "
+        f"Consider the temperature, I do not want to be outside if it is too hot or too cold. "
+        f"Recommend events or places that are close to the budget given for that location. They do not have to be free.\n"
+        f"{''.join(lines)}"
+        f"Format your response as a JSON array with one object per location. Each object has an `index` (the location number) "
+        f"and `recommendations`, a JSON array of recommendation objects.\n"
+        f"{RECOMMENDATION_KEYS_PROMPT}"
+        f"Provide only the JSON.\n"
+    )
+
+
+async def get_batch_recommendations(contexts: list[tuple], use_cache: bool = True) -> tuple[list[list[Recommendation] | TripError], list[bool]]:
+    # contexts are (formatted_address, description, temperature, lat, lon,
+    # budget_krw, interests, date, end_date) tuples. Cached answers are
+    # reused; the rest are deduplicated by cache key and packed
+    # BATCH_PROMPT_SIZE to a prompt. Locations whose whole pack failed get a
+    # TripError instead of a list. Also returns which results were newly
+    # generated (one per distinct context) rather than served again.
+    results: list[list[Recommendation] | TripError] = [[] for _ in contexts]
+    generated = [False] * len(contexts)
+    pending: dict[str, list[int]] = {}
+    for index, (loc, description, temperature, lat, lon, budget_krw, interests, date, end_date) in enumerate(contexts):
+        cache_key = recommendation_cache_key(loc, description, temperature, budget_krw, interests, date, end_date)
+        cached = recommendation_cache.get(cache_key) if use_cache else MISSING
+        if cached is not MISSING:
+            results[index] = [Recommendation.from_row(row) for row in cached["items"]]
+        else:
+            pending.setdefault(cache_key, []).append(index)
+
+    async def resolve(cache_key: str, items: list[Recommendation] | None, context: tuple):
+        if items:
+            rows = [item.to_row() for item in items]
+            raw = json.dumps([item.to_dict() for item in items], ensure_ascii=False)
+            recommendation_cache.set(cache_key, {"items": rows, "raw": raw})
+            generated[pending[cache_key][0]] = True
+        else:
+            # The packed answer had nothing for this location; ask on its own.
+            # If that is shed or fails, only this location fails: other
+            # packs may already have succeeded.
+            try:
+                items, _, fresh = await get_recommendations(*context, use_cache=False)
+            except (admission.Overloaded, resilience.UpstreamUnavailable) as e:
+                error = TripError("unavailable", f"Recommendations: {e}")
+                for index in pending[cache_key]:
+                    results[index] = error
+                return
+            generated[pending[cache_key][0]] = fresh
+            rows = [item.to_row() for item in items]
+        for index in pending[cache_key]:
+            results[index] = [Recommendation.from_row(row) for row in rows]
+
+    async def run_pack(cache_keys: list[str]):
+        pack = [contexts[pending[cache_key][0]] for cache_key in cache_keys]
+        try:
+            text = await generate_content(build_batch_prompt(pack), BATCH_GENERATION_CONFIG)
+            parsed = parse_batch_response(text or "")
+            if not parsed:
+                raise ValueError("no usable answer")
+        except (admission.Overloaded, resilience.UpstreamUnavailable):
+            raise
+        except Exception as e:
+            # Asking for each location on its own would multiply the calls
+            # to an upstream that just failed; report them as failed instead.
+            logger.error(f"AI batch error: {str(e)}")
+            error = TripError("recommendations", str(e))
+            for cache_key in cache_keys:
+                for index in pending[cache_key]:
+                    results[index] = error
+            return
+        await asyncio.gather(*(
+            resolve(cache_key, parsed.get(position), pack[position])
+            for position, cache_key in enumerate(cache_keys)
+        ))
+
+    cache_keys = list(pending)
+    await asyncio.gather(*(
+        run_pack(cache_keys[start:start + BATCH_PROMPT_SIZE])
+        for start in range(0, len(cache_keys), BATCH_PROMPT_SIZE)
+    ))
+    return results, generated
+
+
+async def stream_recommendations(formatted_address: str, description: str, temperature: float, lat: float, lon: float, budget_krw: float = 0.0, interests: list[str] = [], date: datetime.date | None = None, end_date: datetime.date | None = None, use_cache: bool = True):
+    # Yields standardized items as soon as each one is parsed and geocoded.
+    cache_key = recommendation_cache_key(formatted_address, description, temperature, budget_krw, interests, date, end_date)
+    semaphore = asyncio.Semaphore(RECOMMENDATION_GEOCODE_CONCURRENCY)
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def geocode_and_put(item: Recommendation, generated: bool):
+        reuse_known_places([item], lat, lon)
+        await _geocode_recommendation(item, semaphore)
+        place_store.remember([item], generated)
+        await queue.put(item)
+
+    async def produce():
+        pending = []
+        try:
+            cached = recommendation_cache.get(cache_key) if use_cache else MISSING
+            if cached is not MISSING:
+                for row in cached["items"]:
+                    pending.append(asyncio.create_task(geocode_and_put(Recommendation.from_row(row), False)))
+                await asyncio.gather(*pending)
+                return
+
+            prompt = build_recommendation_prompt(formatted_address, description, temperature, lat, lon, budget_krw, interests, date, end_date)
+            parser = JSONArrayStreamParser()
+            chunks = []
+            rows = []
+            async for chunk in stream_content(prompt, RECOMMENDATION_GENERATION_CONFIG):
+                chunks.append(chunk)
+                for obj in parser.feed(chunk):
+                    item = Recommendation.from_model(obj)
+                    rows.append(item.to_row())
+                    pending.append(asyncio.create_task(geocode_and_put(item, True)))
+            await asyncio.gather(*pending)
+            if rows:
+                recommendation_cache.set(cache_key, {"items": rows, "raw": "".join(chunks).strip()})
+        except Exception as e:
+            for task in pending:
+                task.cancel()
+            await queue.put(e)
+        finally:
+            await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+
+
+def _gemini_text(data: dict):
+    candidates = data.get("candidates") or []
+    if not candidates:
+        return None
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    texts = [part["text"] for part in parts if isinstance(part.get("text"), str)]
+    return "".join(texts) if texts else None
+
+
+async def generate_content(prompt: str, generation_config: dict | None = None):
+    url = f"{GEMINI_API_BASE}/{GEMINI_MODEL}:generateContent"
+    body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+    if generation_config:
+        body["generationConfig"] = generation_config
+    client = upstream.get_client("gemini")
+    response = await resilience.guarded(
+        "gemini",
+        lambda: client.post(url, json=body, headers={"x-goog-api-key": GEMINI_API_KEY}),
+        timeout=GEMINI_TIMEOUT,
+        reserve=RECOMMENDATION_GEOCODE_TIMEOUT,
+    )
+    response.raise_for_status()
+    return _gemini_text(loads(response.content))
+
+
+async def stream_content(prompt: str, generation_config: dict | None = None):
+    url = f"{GEMINI_API_BASE}/{GEMINI_MODEL}:streamGenerateContent"
+    body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+    if generation_config:
+        body["generationConfig"] = generation_config
+    headers = {"x-goog-api-key": GEMINI_API_KEY}
+    circuit = resilience.breaker("gemini")
+    circuit.before_call()
+    recorded = False
+    try:
+        # The slot is held for the whole stream, as it occupies the upstream.
+        async with admission.limit("gemini").slot(resilience.budget(admission.UPSTREAM_QUEUE_TIMEOUT)):
+            with metrics.upstream_call("gemini_stream") as call:
+                async with upstream.get_client("gemini").stream("POST", url, params={"alt": "sse"}, json=body, headers=headers) as response:
+                    call.status = response.status_code
+                    if response.status_code >= 500 or response.status_code == 429:
+                        circuit.record_failure()
+                    else:
+                        circuit.record_success()
+                    recorded = True
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        text = _gemini_text(loads(line[5:]))
+                        if text:
+                            yield text
+    except admission.Overloaded:
+        circuit.record_cancel()
+        raise
+    except Exception:
+        if not recorded:
+            circuit.record_failure()
+        raise
+    except BaseException:
+        if not recorded:
+            circuit.record_cancel()
+        raise
+
+
+async def get_coordinates(location: str):
+    if gazetteer is not None:
+        match = gazetteer.resolve(location, GAZETTEER_MIN_CONFIDENCE)
+        if match is not None:
+            return match
+    cache_key = normalize_text(location)
+    cached = geocode_cache.get(cache_key)
+    if cached is not MISSING:
+        if cached is None:
+            return None, None, None
+        return tuple(cached)
+    return await geocode_flight.do(cache_key, lambda: _fetch_coordinates(location, cache_key))
+
+
+async def _fetch_coordinates(location: str, cache_key: str):
     params = {"address": location, "key": GOOGLE_API_KEY}
-    response = requests.get(url, params=params)
-    data = response.json()
+    client = upstream.get_client("maps")
+
+    def attempt():
+        return resilience.guarded("maps", lambda: client.get(GEOCODE_URL, params=params), timeout=GEOCODE_TIMEOUT)
+
+    response = await resilience.hedged(attempt, GEOCODE_HEDGE_DELAY, GEOCODE_HEDGE_ATTEMPTS)
+    data = loads(response.content)
     if not data.get("results"):
+        # Only cache definitive misses; quota or auth errors must be retried.
+        if data.get("status") == "ZERO_RESULTS":
+            geocode_cache.set(cache_key, None, ttl=GEOCODE_NEGATIVE_CACHE_TTL)
         return None, None, None
     result = data["results"][0]
     loc = result["geometry"]["location"]
     formatted_address = result["formatted_address"]
+    geocode_cache.set(cache_key, [loc["lat"], loc["lng"], formatted_address])
     return loc["lat"], loc["lng"], formatted_address
 
 
-def get_weather(lat: float, lon: float):
-    url = "https://api.openweathermap.org/data/2.5/weather"
+def grid_cell(lat: float, lon: float, resolution: float) -> tuple[str, float, float]:
+    # (cell key, centre lat, centre lon) of the resolution-degree cell around
+    # a point. Every caller in a cell shares one payload, fetched for the centre.
+    cell_lat, cell_lon = round(lat / resolution), round(lon / resolution)
+    return f"{cell_lat}:{cell_lon}", round(cell_lat * resolution, 6), round(cell_lon * resolution, 6)
+
+
+async def fetch_weather(lat: float, lon: float):
     params = {
         "lat": lat,
         "lon": lon,
@@ -125,460 +632,627 @@ def get_weather(lat: float, lon: float):
         "units": "metric",
         "lang": "en"
     }
-    response = requests.get(url, params=params)
-    data = response.json()
-    logger.info(f"Weather API raw response: {data}")
+    client = upstream.get_client("weather")
+    response = await resilience.guarded("weather", lambda: client.get(WEATHER_URL, params=params), timeout=WEATHER_TIMEOUT)
+    data = loads(response.content)
+    logger.debug("Weather API raw response: %s", data)
     return data
 
 
-def get_coordinates_for_recommendations(recommendations: list):
-    for item in recommendations:
-        location_str = item.get("Location")
-        if location_str and location_str != "N/A":
-            lat, lon, _ = get_coordinates(location_str)
-            if lat is not None and lon is not None:
-                item["lat"] = lat
-                item["lon"] = lon
-            else:
-                logger.warning(f"Could not get coordinates for: {location_str}")
-    return recommendations
+def _weather_ok(data: dict) -> bool:
+    return data.get("cod") == 200
 
 
-def parse_ai_response(json_string: str) -> list:
-    try:
-        json_match = re.search(r'```json\s*(.*?)\s*```', json_string, re.DOTALL)
-        if json_match:
-            json_content = json_match.group(1)
-        else:
-            json_content = json_string
-
-        parsed_data = json.loads(json_content)
-        if not isinstance(parsed_data, list):
-            logger.warning(f"AI response is not a JSON list: {parsed_data}. Attempting to wrap.")
-            if isinstance(parsed_data, dict):
-                parsed_data = [parsed_data]
-            else:
-                return []
-
-        standardized_items = []
-        for item in parsed_data:
-            standardized_item = {
-                "Name of Place": item.get("name", "N/A"),
-                "Location": item.get("location", "N/A"),
-                "Estimated Travel Time": item.get("travel_time", "N/A"),
-                "Description": item.get("description", "N/A"),
-                "Website": item.get("website", "N/A"),
-                "Cost_KRW": item.get("cost_krw", 0.0),
-                "Cost_USD": item.get("cost_usd", 0.0),
-                "Recommended_Clothing": item.get("recommended_clothing", "N/A"),
-                "Recommended_Essentials": item.get("recommended_essentials", "N/A"),
-                "lat": None,
-                "lon": None
-            }
-            if standardized_item["Website"] != "N/A" and standardized_item["Website"].strip():
-                if not URL_PROTOCOL_REGEX.match(standardized_item["Website"]):
-                    standardized_item["Website"] = "https://" + standardized_item["Website"]
-            standardized_items.append(standardized_item)
-
-        return standardized_items
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to decode JSON from AI response: {e}. Raw response: {json_string}")
-        cleaned_json_string = re.sub(r',\s*}', '}', json_string)
-        cleaned_json_string = re.sub(r',\s*]', ']', cleaned_json_string)
-        cleaned_json_string = re.sub(r'//.*?\n|/\*.*?\*/', '', cleaned_json_string, flags=re.DOTALL)
-        try:
-            parsed_data = json.loads(cleaned_json_string)
-            if not isinstance(parsed_data, list):
-                if isinstance(parsed_data, dict):
-                    parsed_data = [parsed_data]
-                else:
-                    return []
-            standardized_items = []
-            for item in parsed_data:
-                standardized_item = {
-                    "Name of Place": item.get("name", "N/A"),
-                    "Location": item.get("location", "N/A"),
-                    "Estimated Travel Time": item.get("travel_time", "N/A"),
-                    "Description": item.get("description", "N/A"),
-                    "Website": item.get("website", "N/A"),
-                    "Cost_KRW": item.get("cost_krw", 0.0),
-                    "Cost_USD": item.get("cost_usd", 0.0),
-                    "Recommended_Clothing": item.get("recommended_clothing", "N/A"),
-                    "Recommended_Essentials": item.get("recommended_essentials", "N/A"),
-                    "lat": None,
-                    "lon": None
-                }
-                if standardized_item["Website"] != "N/A" and standardized_item["Website"].strip():
-                    if not URL_PROTOCOL_REGEX.match(standardized_item["Website"]):
-                        standardized_item["Website"] = "https://" + standardized_item["Website"]
-                standardized_items.append(standardized_item)
-            return standardized_items
-        except json.JSONDecodeError as e_retry:
-            logger.error(f"Failed to decode JSON even after cleaning: {e_retry}. Cleaned response: {cleaned_json_string}")
-            return []
-    except Exception as e:
-        logger.error(f"An unexpected error occurred during JSON parsing: {e}. Raw response: {json_string}")
-        return []
+def _weather_cell_fetch(lat: float, lon: float):
+    cell_key, center_lat, center_lon = grid_cell(lat, lon, WEATHER_GRID_RESOLUTION)
+    return cell_key, lambda: weather_flight.do(cell_key, lambda: fetch_weather(center_lat, center_lon))
 
 
-@app.get("/weather/json", response_class=JSONResponse)
-def weather_json(loc: str = Query(...), budget_krw: float = Query(0.0), interests: list[str] = Query([])):
-    lat, lon, formatted_address = get_coordinates(loc)
-    if lat is None:
-        return JSONResponse({"error": "Location not found."}, status_code=404)
+async def get_weather(lat: float, lon: float):
+    cell_key, fetch = _weather_cell_fetch(lat, lon)
+    return await weather_cache.get_or_fetch(cell_key, fetch, should_cache=_weather_ok)
 
-    weather_data = get_weather(lat, lon)
-    if weather_data.get("cod") != 200:
-        return JSONResponse({"error": f"Weather API error: {weather_data.get('message', 'Unknown')}"}, status_code=500)
-
-    temperature = weather_data["main"]["temp"]
-    description = weather_data["weather"][0]["description"]
-    humidity = weather_data["main"].get("humidity")
-
-    ai_tip_raw = get_ai_recommendation(formatted_address, description, temperature, lat, lon, budget_krw, interests)
-    ai_items = parse_ai_response(ai_tip_raw)
-    ai_items_with_coords = get_coordinates_for_recommendations(ai_items)
-
-    budget_display = "Any"
-    if budget_krw > 0:
-        budget_display = f"{budget_krw:,.0f} KRW"
-        if EXCHANGE_RATE_KRW_TO_USD > 0:
-            budget_usd = budget_krw * EXCHANGE_RATE_KRW_TO_USD
-            budget_display += f" (approx. ${budget_usd:,.2f} USD)"
-
-    return JSONResponse({
-        "location": formatted_address,
-        "coordinates": {"lat": lat, "lon": lon},
-        "temperature_celsius": temperature,
-        "description": description,
-        "humidity": humidity,
-        "budget": budget_display,
-        "interests": interests,
-        "ai_recommendations": ai_items_with_coords
-    })
 
+async def fetch_forecast(lat: float, lon: float) -> Forecast:
+    params = {
+        "lat": lat,
+        "lon": lon,
+        "appid": WEATHER_API_KEY,
+        "units": "metric",
+        "lang": "en"
+    }
+    client = upstream.get_client("weather")
+    response = await resilience.guarded("weather", lambda: client.get(FORECAST_URL, params=params), timeout=WEATHER_TIMEOUT)
+    data = loads(response.content)
+    if str(data.get("cod")) != "200":
+        raise TripError("weather", data.get("message", "Unknown"))
+    try:
+        return Forecast.from_payload(data)
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        logger.error(f"Malformed forecast: {str(e)}")
+        raise TripError("weather_incomplete", str(e))
 
-@app.get("/weather/text", response_class=PlainTextResponse)
-def weather_text(loc: str = Query(...), budget_krw: float = Query(0.0), interests: list[str] = Query([])):
-    lat, lon, formatted_address = get_coordinates(loc)
-    if lat is None:
-        return PlainTextResponse("Error: Location not found.", status_code=404)
 
-    weather_data = get_weather(lat, lon)
-    if weather_data.get("cod") != 200:
-        return PlainTextResponse(f"Error: Weather API error: {weather_data.get('message', 'Unknown')}", status_code=500)
-
-    temperature = weather_data["main"]["temp"]
-    description = weather_data["weather"][0]["description"]
-    humidity = weather_data["main"].get("humidity")
-
-    ai_tip_raw = get_ai_recommendation(formatted_address, description, temperature, lat, lon, budget_krw, interests)
-    ai_items = parse_ai_response(ai_tip_raw)
-
-    budget_display = "Any"
-    if budget_krw > 0:
-        budget_display = f"{budget_krw:,.0f} KRW"
-        if EXCHANGE_RATE_KRW_TO_USD > 0:
-            budget_usd = budget_krw * EXCHANGE_RATE_KRW_TO_USD
-            budget_display += f" (approx. ${budget_usd:,.2f} USD)"
-
-    interests_display = ", ".join(interests) if interests else "None"
-
-    recommendations_text = ""
-    for item in ai_items:
-        cost_display = ""
-        cost_krw_val = item.get("Cost_KRW", 0.0)
-        cost_usd_val = item.get("Cost_USD", 0.0)
-        if cost_krw_val > 0:
-            cost_display += f"{cost_krw_val:,.0f} KRW"
-        if cost_usd_val > 0:
-            if cost_display:
-                cost_display += " / "
-            cost_display += f"${cost_usd_val:,.2f} USD"
-        if not cost_display and cost_krw_val == 0 and cost_usd_val == 0:
-             cost_display = "Free"
-        if not cost_display:
-            cost_display = "N/A"
-
-        recommendations_text += (
-            f"  - Name: {item.get('Name of Place', 'N/A')}\n"
-            f"    Location: {item.get('Location', 'N/A')}\n"
-            f"    Travel Time: {item.get('Estimated Travel Time', 'N/A')}\n"
-            f"    Description: {item.get('Description', 'N/A')}\n"
-            f"    Website: {item.get('Website', 'N/A')}\n"
-            f"    Cost: {cost_display}\n"
-            f"    Recommended Clothing: {item.get('Recommended_Clothing', 'N/A')}\n"
-            f"    Recommended Essentials: {item.get('Recommended_Essentials', 'N/A')}\n\n"
-        )
+async def get_forecast(lat: float, lon: float) -> Forecast:
+    cell_key, center_lat, center_lon = grid_cell(lat, lon, FORECAST_GRID_RESOLUTION)
+    return await forecast_cache.get_or_fetch(cell_key, lambda: forecast_flight.do(cell_key, lambda: fetch_forecast(center_lat, center_lon)))
 
-    response_text = (
-        f"Weather Report for {formatted_address}\n"
-        f"-----------------------------------\n"
-        f"Coordinates: Lat {lat}, Lon {lon}\n"
-        f"Temperature: {temperature}°C\n"
-        f"Description: {description}\n"
-        f"Humidity: {humidity}%\n"
-        f"Budget Considered: {budget_display}\n"
-        f"Interests: {interests_display}\n\n"
-        f"AI Recommendations:\n"
-        f"-------------------------------\n"
-        f"{recommendations_text}"
-    )
-    return PlainTextResponse(response_text)
+
+async def forecast_conditions(lat: float, lon: float, date: datetime.date, end_date: datetime.date):
+    # (temperature, description, humidity, days) for a dated trip, sliced out
+    # of the area's cached forecast. None for a trip that is only today,
+    # which current conditions describe better.
+    if end_date < date:
+        raise TripError("date", "end_date is before date")
+    if (end_date - date).days >= FORECAST_MAX_DAYS:
+        raise TripError("date", f"at most {FORECAST_MAX_DAYS} days per trip")
+    try:
+        with metrics.stage("forecast"):
+            forecast = await get_forecast(lat, lon)
+    except (resilience.UpstreamUnavailable, httpx.HTTPError) as e:
+        raise TripError("unavailable", f"Forecast: {e}")
+    today = forecast.today()
+    if date < today:
+        raise TripError("date", f"{date.isoformat()} is in the past")
+    if end_date == today:
+        return None
+    days = forecast.span(date, end_date)
+    covered = {day.date for day in days}
+    for offset in range((end_date - date).days + 1):
+        day = date + datetime.timedelta(days=offset)
+        # Today may have no slots left; any other day must be covered.
+        if day not in covered and day != today:
+            raise TripError("date", f"no forecast for {day.isoformat()}; it reaches {forecast.last_date().isoformat()}")
+    return (*summarize(days), days)
+
+
+def reuse_known_places(items: list[Recommendation], lat: float, lon: float):
+    # Fills in coordinates of places recommended near here before, so they
+    # skip geocoding.
+    for item in items:
+        if item.lat is None:
+            known = place_store.find(item.name, item.location, lat, lon, PLACE_MATCH_RADIUS_KM)
+            if known is not None:
+                item.lat, item.lon = known
+
+
+async def _geocode_recommendation(item: Recommendation, semaphore: asyncio.Semaphore):
+    location_str = item.location
+    if item.lat is not None or not location_str or location_str == "N/A":
+        return
+    try:
+        async with semaphore:
+            lat, lon, _ = await asyncio.wait_for(get_coordinates(location_str), resilience.budget(RECOMMENDATION_GEOCODE_TIMEOUT))
+    except asyncio.TimeoutError:
+        logger.warning(f"Timed out getting coordinates for: {location_str}")
+        return
+    except Exception as e:
+        logger.warning(f"Error getting coordinates for {location_str}: {e}")
+        return
+    if lat is not None and lon is not None:
+        item.lat = lat
+        item.lon = lon
+    else:
+        logger.warning(f"Could not get coordinates for: {location_str}")
 
 
-@app.get("/weather", response_class=HTMLResponse)
-def weather(
-    loc: str = Query(..., example="1600 Amphitheatre Parkway, Mountain View, CA"),
-    budget_krw: float = Query(0.0, description="Budget for recommendations in South Korean Won (KRW). Use 0 for any budget."),
-    interests: list[str] = Query([], description="A comma-separated list of interests (e.g., 'museums,food,parks')."),
-    save_to_file: bool = Query(False, description="Set to true to save the report to a local HTML file.")
-):
-    lat, lon, formatted_address = get_coordinates(loc)
+async def get_coordinates_for_recommendations(recommendations: list[Recommendation]):
+    semaphore = asyncio.Semaphore(RECOMMENDATION_GEOCODE_CONCURRENCY)
+    await asyncio.gather(*(_geocode_recommendation(item, semaphore) for item in recommendations))
+    return recommendations
+
+
+async def resolve_conditions(loc: str, date: datetime.date | None = None, end_date: datetime.date | None = None):
+    try:
+        with metrics.stage("geocode"):
+            lat, lon, formatted_address = await get_coordinates(loc)
+    except (resilience.UpstreamUnavailable, httpx.HTTPError) as e:
+        raise TripError("unavailable", f"Geocoding: {e}")
     if lat is None:
-        return HTMLResponse("<h3>Location not found in Google Maps API.</h3>")
+        raise TripError("location")
 
-    weather_data = get_weather(lat, lon)
+    if date is not None:
+        conditions = await forecast_conditions(lat, lon, date, end_date or date)
+        if conditions is not None:
+            return (lat, lon, formatted_address, *conditions)
 
+    try:
+        with metrics.stage("weather"):
+            weather_data = await get_weather(lat, lon)
+    except (resilience.UpstreamUnavailable, httpx.HTTPError) as e:
+        raise TripError("unavailable", f"Weather: {e}")
     if weather_data.get("cod") != 200:
-        message = weather_data.get("message", "Unknown error")
-        return HTMLResponse(f"<h3>Weather API error: {message}</h3>")
+        raise TripError("weather", weather_data.get("message", "Unknown"))
 
     try:
         temperature = weather_data["main"]["temp"]
         description = weather_data["weather"][0]["description"]
-        humidity = weather_data["main"]["humidity"]
-    except KeyError as e:
+        humidity = weather_data["main"].get("humidity")
+    except (KeyError, IndexError) as e:
         logger.error(f"Missing weather key: {str(e)}")
-        return HTMLResponse(f"<h3>Weather data incomplete: Missing key {str(e)}</h3>")
-
-    ai_tip_raw = get_ai_recommendation(formatted_address, description, temperature, lat, lon, budget_krw, interests)
-    ai_items = parse_ai_response(ai_tip_raw)
-    ai_items_with_coords = get_coordinates_for_recommendations(ai_items)
-
-    markers_js_array = []
-    for item in ai_items_with_coords:
-        if "lat" in item and "lon" in item:
-            name = item.get("Name of Place", "Unknown Place")
-            location = item.get("Location", "Unknown Location")
-            description_text = item.get("Description", "No description available.")
-            travel_time = item.get("Estimated Travel Time", "N/A")
-            recommended_clothing = item.get("Recommended_Clothing", "N/A")
-            recommended_essentials = item.get("Recommended_Essentials", "N/A")
-
-            cost_krw_val = item.get("Cost_KRW", 0.0)
-            cost_usd_val = item.get("Cost_USD", 0.0)
-            cost_display = "N/A"
-
-            cost_parts = []
-            if cost_krw_val > 0:
-                cost_parts.append(f"{cost_krw_val:,.0f} KRW")
-            if cost_usd_val > 0:
-                cost_parts.append(f"${cost_usd_val:,.2f} USD")
-            cost_display = " / ".join(cost_parts) if cost_parts else "N/A"
-            if cost_krw_val == 0 and cost_usd_val == 0 and ("free" in str(item.get('description', '')).lower() or "free" in str(item.get('name', '')).lower()):
-                cost_display = "Free"
-
-
-            website = item.get("Website", "N/A")
-
-            escaped_name = html_escape(name)
-            escaped_location = html_escape(location)
-            escaped_description_text = html_escape(description_text)
-            escaped_travel_time = html_escape(travel_time)
-            escaped_cost_display = html_escape(cost_display)
-            escaped_recommended_clothing = html_escape(recommended_clothing)
-            escaped_recommended_essentials = html_escape(recommended_essentials)
-
-            info_content = (
-                f"<b>{escaped_name}</b><br>"
-                f"Location: {escaped_location}<br>"
-                f"Travel Time: {escaped_travel_time}<br>"
-                f"Cost: {escaped_cost_display}<br>"
-                f"Description: {escaped_description_text}<br>"
-                f"Clothing: {escaped_recommended_clothing}<br>"
-                f"Essentials: {escaped_recommended_essentials}<br>"
-            )
-
-            if website and website != "N/A" and website.strip():
-                info_content += f"<a href='{html_escape(website)}' target='_blank'>Website</a>"
-            else:
-                info_content += "Website: N/A"
-
-
-            markers_js_array.append({
-                "position": {"lat": item["lat"], "lng": item["lon"]},
-                "title": name,
-                "infoContent": info_content
-            })
-
-
-    if budget_krw > 0:
-        budget_display = f"{budget_krw:,.0f} KRW"
-        if EXCHANGE_RATE_KRW_TO_USD > 0:
-            budget_usd = budget_krw * EXCHANGE_RATE_KRW_TO_USD
-            budget_display += f" (approx. ${budget_usd:,.2f} USD)"
-    else:
-        budget_display = "Any"
-
-    interests_display = ", ".join(interests) if interests else "None"
-
-    raw_ai_section = ""
-    if save_to_file:
-        raw_ai_section = f"""
-        <h3>Raw Gemini AI Response (JSON)</h3>
-        <pre>{html_escape(ai_tip_raw)}</pre>
-        """
-
-    my_location_marker_color = "blue"
-
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Weather Report for {formatted_address}</title>
-        <style>
-            body {{ font-family: Arial, sans-serif; margin: 20px; background-color: #f4f4f4; color: #333; }}
-            h2, h3 {{ color: #0056b3; }}
-            p {{ margin-bottom: 5px; }}
-            b {{ color: #555; }}
-            pre {{ background-color: #eee; padding: 10px; border-radius: 5px; overflow-x: auto; }}
-            #map {{ height: 500px; width: 100%; border: 1px solid #ccc; margin-top: 20px; }}
-            ul {{ list-style-type: disc; margin-left: 20px; }}
-            li {{ margin-bottom: 10px; }}
-        </style>
-    </head>
-    <body>
-        <h2>Weather in {formatted_address}</h2>
-        <p><b>Temperature:</b> {temperature}°C</p>
-        <p><b>Description:</b> {description}</p>
-        <p><b>Humidity:</b> {humidity}%</p>
-        <p><b>Interests:</b> {interests_display}</p>
-
-        <h3>AI Recommendations (Budget: {budget_display})</h3>
-        <ul>
-            {''.join([
-                f"""
-                <li>
-                    <b>{html_escape(item.get('Name of Place', 'N/A'))}</b><br>
-                    Location: {html_escape(item.get('Location', 'N/A'))}<br>
-                    Travel Time: {html_escape(item.get('Estimated Travel Time', 'N/A'))}<br>
-                    Description: {html_escape(item.get('Description', 'N/A'))}<br>
-                    Website: {f'<a href="{html_escape(item["Website"])}" target="_blank">{html_escape(item["Website"])}</a>' if item.get('Website') != 'N/A' else 'N/A'}<br>
-                    Cost: {f"{item.get('Cost_KRW', 0.0):,.0f} KRW" + (f" / ${item.get('Cost_USD', 0.0):,.2f} USD" if item.get('Cost_USD', 0.0) > 0 else '') if item.get('Cost_KRW', 0.0) > 0 or item.get('Cost_USD', 0.0) > 0 else ('Free' if item.get('Cost_KRW', 0.0) == 0 and item.get('Cost_USD', 0.0) == 0 else 'N/A')}<br>
-                    <b>Recommended Clothing:</b> {html_escape(item.get('Recommended_Clothing', 'N/A'))}<br>
-                    <b>Recommended Essentials:</b> {html_escape(item.get('Recommended_Essentials', 'N/A'))}
-                </li>
-                """
-                for item in ai_items_with_coords
-            ])}
-        </ul>
-        {raw_ai_section}
-
-
-        <h3>Recommended Locations on Map</h3>
-        <div id="map"></div>
-
-
-        <script>
-            let map;
-            let markers = [];
-            let infoWindows = [];
-
-            const YOUR_LAT = {lat};
-            const YOUR_LON = {lon};
-            const MARKERS = {json.dumps(markers_js_array)};
-            const MY_LOCATION_MARKER_COLOR = "{my_location_marker_color}";
-
-            async function initMap() {{
-                const mapsLib = await google.maps.importLibrary("maps");
-                const markerLib = await google.maps.importLibrary("marker");
-                const Map = mapsLib.Map;
-                const AdvancedMarkerElement = markerLib.AdvancedMarkerElement;
-
-
-                map = new Map(document.getElementById("map"), {{
-                    zoom: 12,
-                    center: {{ lat: YOUR_LAT, lng: YOUR_LON }},
-                    mapId: "DEMO_MAP_ID",
-                }});
-
-                const svgIcon = document.createElement('div');
-                svgIcon.innerHTML = `
-                    <svg width="24" height="24" viewBox="0 0 24 24" fill="` + MY_LOCATION_MARKER_COLOR + `" xmlns="http://www.w3.org/2000/svg">
-                        <path d="M12 2C8.13 2 5 5.13 5 9c0 5.25 7 13 7 13s7-7.75 7-13c0-3.87-3.13-7-7-7zm0 9.5c-1.38 0-2.5-1.12-2.5-2.5S10.62 6.5 12 6.5s2.5 1.12 2.5 2.5-1.12 2.5-2.5 2.5z"/>
-                    </svg>
-                `;
-
-                const currentMarker = new AdvancedMarkerElement({{
-                    map: map,
-                    position: {{ lat: YOUR_LAT, lng: YOUR_LON }},
-                    title: "Your Current Location",
-                    content: svgIcon
-                }});
-                const currentInfoWindow = new google.maps.InfoWindow({{
-                    content: "<b>You Are Here:</b><br>{html_escape(formatted_address)}",
-                }});
-                currentMarker.addListener("click", () => {{
-                    currentInfoWindow.open(map, currentMarker);
-                }});
-                markers.push(currentMarker);
-                infoWindows.push(currentInfoWindow);
-
-
-                MARKERS.forEach((data, index) => {{
-                    const marker = new AdvancedMarkerElement({{
-                        map: map,
-                        position: data.position,
-                        title: data.title,
-                    }});
-
-                    const infoWindow = new google.maps.InfoWindow({{
-                        content: data.infoContent,
-                    }});
-
-                    marker.addListener("click", () => {{
-                        infoWindows.forEach(iw => iw.close());
-                        infoWindow.open(map, marker);
-                    }});
-
-                    markers.push(marker);
-                    infoWindows.push(infoWindow);
-                }});
-
-                if (markers.length > 0) {{
-                    const bounds = new google.maps.LatLngBounds();
-                    markers.forEach(marker => bounds.extend(marker.position));
-                    map.fitBounds(bounds);
-                }}
-            }}
-
-            const script = document.createElement('script');
-            script.src = `https://maps.googleapis.com/maps/api/js?key={GOOGLE_API_KEY}&callback=initMap&v=beta&libraries=marker`;
-            script.async = true;
-            document.head.appendChild(script);
-        </script>
-    </body>
-    </html>
-    """
-
-    if save_to_file:
-        SAVE_DIRECTORY.mkdir(parents=True, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        safe_loc_name = re.sub(r'[^\w\s-]', '', formatted_address).strip().replace(' ', '_')[:50]
-        filename = SAVE_DIRECTORY / f"weather_report_full_{safe_loc_name}_{timestamp}.html"
+        raise TripError("weather_incomplete", str(e))
+    return lat, lon, formatted_address, temperature, description, humidity, []
+
+
+async def run_trip_pipeline(loc: str, budget_krw: float = 0.0, interests: list[str] = [], use_cache: bool = True, date: datetime.date | None = None, end_date: datetime.date | None = None) -> TripResult:
+    lat, lon, formatted_address, temperature, description, humidity, days = await resolve_conditions(loc, date, end_date)
+    try:
+        with metrics.stage("recommendations"):
+            ai_items, ai_tip_raw, generated = await get_recommendations(formatted_address, description, temperature, lat, lon, budget_krw, interests, date, end_date or date, use_cache=use_cache)
+    except resilience.UpstreamUnavailable as e:
+        raise TripError("unavailable", f"Recommendations: {e}")
+    with metrics.stage("recommendation_geocode"):
+        reuse_known_places(ai_items, lat, lon)
+        ai_items_with_coords = await get_coordinates_for_recommendations(ai_items)
+        place_store.remember(ai_items_with_coords, generated)
+    with metrics.stage("itinerary"):
+        itinerary = plan_itinerary(lat, lon, ai_items_with_coords)
+    return TripResult(
+        location=formatted_address,
+        lat=lat,
+        lon=lon,
+        temperature=temperature,
+        description=description,
+        humidity=humidity,
+        budget_krw=budget_krw,
+        interests=list(interests),
+        recommendations=itinerary,
+        raw_ai=ai_tip_raw,
+        date=date,
+        end_date=end_date or date,
+        daily=days,
+    )
+
+
+def trip_cache_key(loc: str, budget_krw: float, interests: list[str], date: datetime.date | None = None, end_date: datetime.date | None = None) -> str:
+    key = [normalize_text(loc), budget_krw, interests]
+    if date is not None:
+        key += [date.isoformat(), (end_date or date).isoformat()]
+    return json.dumps(key, ensure_ascii=False)
+
+
+async def get_trip(loc: str, budget_krw: float = 0.0, interests: list[str] = [], use_cache: bool = True, date: datetime.date | None = None, end_date: datetime.date | None = None) -> TripResult:
+    cache_key = trip_cache_key(loc, budget_krw, interests, date, end_date)
+    prewarmer.record(trip_cache_key(loc, budget_krw, interests), (loc, budget_krw, list(interests)))
+    if use_cache:
+        cached = trip_cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
+    with prewarmer.live(), resilience.deadline():
+        async with admission_control.admit(admission.PRIORITY_INTERACTIVE if use_cache else admission.PRIORITY_UNCACHED):
+            result = await run_trip_pipeline(loc, budget_krw, interests, use_cache=use_cache, date=date, end_date=end_date)
+    if result.cacheable:
+        trip_cache.set(cache_key, result)
+    return result
+
+
+async def prewarm_destination(destination: tuple, permit) -> bool:
+    # Refreshes whichever of the destination's geocode, weather cell and
+    # recommendations would expire before the next pre-warming cycle.
+    # Returns False as soon as permit() turns an upstream call down.
+    loc, budget_krw, interests = destination
+    with resilience.deadline():
+        geocode_key = normalize_text(loc)
+        in_gazetteer = gazetteer is not None and gazetteer.resolve(loc, GAZETTEER_MIN_CONFIDENCE) is not None
+        remaining = geocode_cache.ttl_remaining(geocode_key)
+        if not in_gazetteer and (remaining is None or remaining < PREWARM_REFRESH_AHEAD):
+            if not await permit():
+                return False
+            await geocode_flight.do(geocode_key, lambda: _fetch_coordinates(loc, geocode_key))
+        lat, lon, formatted_address = await get_coordinates(loc)
+        if lat is None:
+            return True
+
+        cell_key, fetch = _weather_cell_fetch(lat, lon)
+        age = weather_cache.age(cell_key)
+        if age is None or age > WEATHER_CACHE_TTL - PREWARM_REFRESH_AHEAD:
+            if not await permit():
+                return False
+            await weather_cache.refresh(cell_key, fetch, should_cache=_weather_ok)
+
+        lat, lon, formatted_address, temperature, description, humidity, _ = await resolve_conditions(loc)
+        cache_key = recommendation_cache_key(formatted_address, description, temperature, budget_krw, interests)
+        remaining = recommendation_cache.ttl_remaining(cache_key)
+        if remaining is None or remaining < PREWARM_REFRESH_AHEAD:
+            if not await permit():
+                return False
+            await get_recommendations(formatted_address, description, temperature, lat, lon, budget_krw, interests, use_cache=False)
+    return True
+
+
+def _upstreams_healthy() -> bool:
+    return all(resilience.breaker(name).state == resilience.CircuitBreaker.CLOSED for name in upstream.UPSTREAMS)
+
+
+admission_control = admission.AdmissionController()
+metrics.register_stats("admission", "requests", admission_control.stats)
+prewarmer = Prewarmer(prewarm_destination, healthy=_upstreams_healthy)
+metrics.register_stats("prewarm", "destinations", prewarmer.stats)
+
+
+def trip_error_message(error: Exception) -> str:
+    if isinstance(error, TripError):
+        if error.kind == "location":
+            return "Location not found."
+        if error.kind == "weather":
+            return f"Weather API error: {error.message}"
+        if error.kind == "unavailable":
+            return f"Upstream service unavailable: {error.message}"
+        if error.kind == "date":
+            return f"Date not available: {error.message}"
+        if error.kind == "recommendations":
+            return f"AI error: {error.message}"
+        return f"Weather data incomplete: Missing key {error.message}"
+    return f"Upstream error: {str(error)}"
+
+
+def trip_error_status(error: TripError) -> int:
+    if error.kind == "location":
+        return 404
+    if error.kind == "unavailable":
+        return 503
+    if error.kind == "date":
+        return 422
+    if error.kind == "recommendations":
+        return 502
+    return 500
+
+
+@app.exception_handler(admission.Overloaded)
+async def overloaded_handler(request: Request, error: admission.Overloaded):
+    # Shed load fast instead of queueing work the upstreams cannot absorb.
+    return JSONResponse(
+        {"error": f"Server busy, retry later: {error}"},
+        status_code=429,
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def cached_response(request: Request, result: TripResult, fmt: str, render, media_type: str, memoize: bool = True) -> Response:
+    # fmt may carry parameters ("compact:n,lat:0:10"); the stage is per format.
+    # With memoize=False the rendering is made for this response only.
+    renderings = result.renderings if memoize else {}
+    rendering = renderings.get(fmt)
+    if rendering is None:
+        with metrics.stage(f"render_{fmt.partition(':')[0]}"):
+            body = render(result)
+        rendering = ('"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"', body)
+        renderings[fmt] = rendering
+    etag, body = rendering
+
+    # Compressed variants are memoized next to the rendering they came from.
+    encoding = choose_encoding(request.headers.get("accept-encoding")) if len(body) >= COMPRESSION_MIN_BYTES else None
+    if encoding is not None:
+        variant = f"{fmt}:{encoding}"
+        compressed = renderings.get(variant)
+        if compressed is None:
+            with metrics.stage("compress"):
+                compressed = (f'{etag[:-1]}-{encoding}"', compress(body, encoding))
+            renderings[variant] = compressed
+        etag, body = compressed
+
+    cache_control = f"public, max-age={RESPONSE_MAX_AGE}" if result.cacheable else "no-store"
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def _json_body(result: TripResult) -> bytes:
+    return dumps(render_json(result))
+
+
+def _text_body(result: TripResult) -> bytes:
+    return render_text(result).encode("utf-8")
+
+
+def _html_body(result: TripResult) -> bytes:
+    return render_html(result, GOOGLE_API_KEY).encode("utf-8")
+
+
+@app.get("/weather/json", response_class=JSONResponse)
+async def weather_json(request: Request, loc: str = Query(...), budget_krw: float = Query(0.0), interests: list[str] = Query([]), no_cache: bool = Query(False), date: datetime.date | None = Query(None), end_date: datetime.date | None = Query(None)):
+    try:
+        result = await get_trip(loc, budget_krw, interests, use_cache=not no_cache, date=date, end_date=end_date)
+    except TripError as e:
+        return JSONResponse({"error": trip_error_message(e)}, status_code=trip_error_status(e))
+    return cached_response(request, result, "json", _json_body, "application/json")
+
+
+@app.get("/weather/compact", response_class=JSONResponse)
+async def weather_compact(
+    request: Request,
+    loc: str = Query(...),
+    budget_krw: float = Query(0.0),
+    interests: list[str] = Query([]),
+    no_cache: bool = Query(False),
+    date: datetime.date | None = Query(None),
+    end_date: datetime.date | None = Query(None),
+    fields: str | None = Query(None, description="Comma-separated short keys to keep for each recommendation (e.g. 'n,a,lat,lon'); all by default."),
+    offset: int = Query(0, ge=0),
+    limit: int | None = Query(None, ge=1, le=100),
+):
+    # Versioned short-key format for mobile clients; see render.COMPACT_FIELDS.
+    try:
+        projection = parse_compact_fields(fields)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=422)
+    try:
+        result = await get_trip(loc, budget_krw, interests, use_cache=not no_cache, date=date, end_date=end_date)
+    except TripError as e:
+        return JSONResponse({"error": trip_error_message(e)}, status_code=trip_error_status(e))
+    # Pages past the end, or reaching it, render the same as their canonical form.
+    total = len(result.recommendations)
+    offset = min(offset, total)
+    if limit is not None and offset + limit >= total:
+        limit = None
+    fmt = f"compact:{','.join(projection)}:{offset}:{limit}"
+    # Only pages of the full projection are memoized on the result, a set
+    # bounded by the number of recommendations; the thousands of possible
+    # field subsets are rendered per request.
+    memoize = len(projection) == len(COMPACT_FIELDS)
+    return cached_response(request, result, fmt, lambda result: dumps(render_compact(result, projection, offset, limit)), "application/json", memoize)
+
+
+@app.get("/weather/text", response_class=PlainTextResponse)
+async def weather_text(request: Request, loc: str = Query(...), budget_krw: float = Query(0.0), interests: list[str] = Query([]), no_cache: bool = Query(False), date: datetime.date | None = Query(None), end_date: datetime.date | None = Query(None)):
+    try:
+        result = await get_trip(loc, budget_krw, interests, use_cache=not no_cache, date=date, end_date=end_date)
+    except TripError as e:
+        if e.kind == "location":
+            return PlainTextResponse("Error: Location not found.", status_code=404)
+        if e.kind == "weather":
+            return PlainTextResponse(f"Error: Weather API error: {e.message}", status_code=500)
+        if e.kind == "unavailable":
+            return PlainTextResponse(f"Error: Upstream service unavailable: {e.message}", status_code=503)
+        if e.kind == "date":
+            return PlainTextResponse(f"Error: Date not available: {e.message}", status_code=422)
+        return PlainTextResponse(f"Error: Weather data incomplete: Missing key {e.message}", status_code=500)
+    return cached_response(request, result, "text", _text_body, "text/plain; charset=utf-8")
+
+
+class BatchLocation(BaseModel):
+    loc: str
+    budget_krw: float = 0.0
+    interests: list[str] = []
+    date: datetime.date | None = None
+    end_date: datetime.date | None = None
+
+
+class BatchRequest(BaseModel):
+    locations: list[BatchLocation]
+    no_cache: bool = False
+
+
+@app.post("/weather/batch")
+async def weather_batch(batch: BatchRequest):
+    if not batch.locations:
+        return JSONResponse({"error": "No locations provided."}, status_code=400)
+    if len(batch.locations) > BATCH_MAX_LOCATIONS:
+        return JSONResponse({"error": f"At most {BATCH_MAX_LOCATIONS} locations per batch."}, status_code=413)
+
+    with prewarmer.live(), resilience.deadline():
+        async with admission_control.admit(admission.PRIORITY_UNCACHED if batch.no_cache else admission.PRIORITY_BULK):
+            # Geocode and fetch weather once per distinct location and dates, all concurrently.
+            unique_locs: dict[tuple, tuple] = {}
+            for entry in batch.locations:
+                prewarmer.record(trip_cache_key(entry.loc, entry.budget_krw, entry.interests), (entry.loc, entry.budget_krw, list(entry.interests)))
+                unique_locs.setdefault((normalize_text(entry.loc), entry.date, entry.end_date), (entry.loc, entry.date, entry.end_date))
+            resolved = await asyncio.gather(*(resolve_conditions(*query) for query in unique_locs.values()), return_exceptions=True)
+            conditions = dict(zip(unique_locs, resolved))
+
+            results: list[dict | None] = [None] * len(batch.locations)
+            contexts = []
+            resolved_entries = []
+            for index, entry in enumerate(batch.locations):
+                condition = conditions[(normalize_text(entry.loc), entry.date, entry.end_date)]
+                if isinstance(condition, Exception):
+                    results[index] = {"index": index, "loc": entry.loc, "status": "error", "error": trip_error_message(condition)}
+                    continue
+                lat, lon, formatted_address, temperature, description, humidity, days = condition
+                contexts.append((formatted_address, description, temperature, lat, lon, entry.budget_krw, entry.interests, entry.date, entry.end_date or entry.date))
+                resolved_entries.append((index, entry, condition))
+
+            try:
+                recommendations, generated = await get_batch_recommendations(contexts, use_cache=not batch.no_cache)
+            except resilience.UpstreamUnavailable as e:
+                error = TripError("unavailable", f"Recommendations: {e}")
+                return JSONResponse({"error": trip_error_message(error)}, status_code=trip_error_status(error))
+            found = [(context, items, fresh) for context, items, fresh in zip(contexts, recommendations, generated) if not isinstance(items, TripError)]
+            for context, items, _ in found:
+                reuse_known_places(items, context[3], context[4])
+            # One fan-out for every item so the per-request concurrency cap applies to the whole batch.
+            await get_coordinates_for_recommendations([item for _, items, _ in found for item in items])
+            place_store.remember([item for _, items, fresh in found if fresh for item in items])
+            place_store.remember([item for _, items, fresh in found if not fresh for item in items], generated=False)
+
+            for (index, entry, condition), items in zip(resolved_entries, recommendations):
+                if isinstance(items, TripError):
+                    results[index] = {"index": index, "loc": entry.loc, "status": "error", "error": trip_error_message(items)}
+                    continue
+                lat, lon, formatted_address, temperature, description, humidity, days = condition
+                result = TripResult(
+                    location=formatted_address,
+                    lat=lat,
+                    lon=lon,
+                    temperature=temperature,
+                    description=description,
+                    humidity=humidity,
+                    budget_krw=entry.budget_krw,
+                    interests=list(entry.interests),
+                    recommendations=plan_itinerary(lat, lon, items),
+                    date=entry.date,
+                    end_date=entry.end_date or entry.date,
+                    daily=days,
+                )
+                if result.cacheable:
+                    trip_cache.set(trip_cache_key(entry.loc, entry.budget_krw, entry.interests, entry.date, entry.end_date), result)
+                results[index] = {"index": index, "loc": entry.loc, "status": "ok", "result": render_json(result)}
+
+    failed = sum(1 for result in results if result["status"] == "error")
+    return Response(dumps({"results": results, "succeeded": len(results) - failed, "failed": failed}), media_type="application/json")
+
+
+def _ndjson(event: dict) -> bytes:
+    return dumps(event) + b"\n"
+
+
+@app.get("/weather/stream")
+async def weather_stream(loc: str = Query(...), budget_krw: float = Query(0.0), interests: list[str] = Query([]), no_cache: bool = Query(False), nearby: bool = Query(False), date: datetime.date | None = Query(None), end_date: datetime.date | None = Query(None)):
+    prewarmer.record(trip_cache_key(loc, budget_krw, interests), (loc, budget_krw, list(interests)))
+    try:
+        with prewarmer.live(), resilience.deadline():
+            async with admission_control.admit(admission.PRIORITY_INTERACTIVE):
+                lat, lon, formatted_address, temperature, description, humidity, days = await resolve_conditions(loc, date, end_date)
+    except TripError as e:
+        return JSONResponse({"error": trip_error_message(e)}, status_code=trip_error_status(e))
+
+    async def events():
+        yield _ndjson({"type": "location", "location": formatted_address, "coordinates": {"lat": lat, "lon": lon}})
+        weather_event = {"type": "weather", "temperature_celsius": temperature, "description": description, "humidity": humidity}
+        if date is not None:
+            weather_event["date"] = date.isoformat()
+            weather_event["end_date"] = (end_date or date).isoformat()
+            weather_event["daily_forecast"] = [day.to_dict() for day in days]
+        yield _ndjson(weather_event)
+        if nearby:
+            # Places recommended around here before, while Gemini is still working.
+            known = place_store.nearby(lat, lon, PLACE_NEARBY_RADIUS_KM, PLACE_NEARBY_LIMIT)
+            yield _ndjson({"type": "nearby", "items": [item.to_dict() for item in known]})
+        count = 0
         try:
-            with open(filename, "w", encoding="utf-8") as f:
-                f.write(html_content)
-            return PlainTextResponse(f"Combined HTML weather report and AI suggestions saved to {filename}")
+            with prewarmer.live():
+                async for item in stream_recommendations(formatted_address, description, temperature, lat, lon, budget_krw, interests, date, end_date or date, use_cache=not no_cache):
+                    count += 1
+                    yield _ndjson({"type": "recommendation", "item": item.to_dict()})
         except Exception as e:
-            logger.error(f"Error saving HTML file: {e}")
-            return PlainTextResponse(f"Error saving HTML file: {e}", status_code=500)
-    else:
-        return HTMLResponse(content=html_content)
+            logger.error(f"AI streaming error: {str(e)}")
+            yield _ndjson({"type": "error", "message": f"AI error: {str(e)}"})
+        yield _ndjson({"type": "done", "count": count})
+
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/weather", response_class=HTMLResponse)
+async def weather(
+    request: Request,
+    loc: str = Query(..., example="1600 Amphitheatre Parkway, Mountain View, CA"),
+    budget_krw: float = Query(0.0, description="Budget for recommendations in South Korean Won (KRW). Use 0 for any budget."),
+    interests: list[str] = Query([], description="A comma-separated list of interests (e.g., 'museums,food,parks')."),
+    save_to_file: bool = Query(False, description="Set to true to save the report to a local HTML file."),
+    no_cache: bool = Query(False, description="Set to true to bypass cached AI recommendations and ask Gemini again."),
+    date: datetime.date | None = Query(None, description="Trip date (YYYY-MM-DD); conditions come from the forecast. Defaults to current conditions."),
+    end_date: datetime.date | None = Query(None, description="Last day of a multi-day trip; defaults to date.")
+):
+    try:
+        result = await get_trip(loc, budget_krw, interests, use_cache=not no_cache, date=date, end_date=end_date)
+    except TripError as e:
+        if e.kind == "location":
+            return HTMLResponse("<h3>Location not found in Google Maps API.</h3>")
+        if e.kind == "weather":
+            return HTMLResponse(f"<h3>Weather API error: {html_escape(e.message)}</h3>")
+        if e.kind == "unavailable":
+            return HTMLResponse(f"<h3>Upstream service unavailable: {html_escape(e.message)}</h3>", status_code=503)
+        if e.kind == "date":
+            return HTMLResponse(f"<h3>Date not available: {html_escape(e.message)}</h3>", status_code=422)
+        return HTMLResponse(f"<h3>Weather data incomplete: Missing key {html_escape(e.message)}</h3>")
+
+    if not save_to_file:
+        return cached_response(request, result, "html", _html_body, "text/html; charset=utf-8")
+
+    html_content = render_html(result, GOOGLE_API_KEY, include_raw=True, inline_assets=True)
+    report_hash = await report_store.save(result.location, html_content)
+    return PlainTextResponse(f"Combined HTML weather report and AI suggestions saved as /reports/{report_hash}")
+
+
+@app.get("/places/nearby")
+def places_nearby(lat: float = Query(..., ge=-90, le=90), lon: float = Query(..., ge=-180, le=180), radius_km: float = Query(PLACE_NEARBY_RADIUS_KM, gt=0, le=100), limit: int = Query(PLACE_NEARBY_LIMIT, ge=1, le=100)):
+    return {"places": [item.to_dict() for item in place_store.nearby(lat, lon, radius_km, limit)]}
+
+
+@app.get("/reports")
+def list_reports(limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0), location: str | None = Query(None)):
+    reports = report_store.recent(limit, offset, location)
+    for report in reports:
+        report["url"] = f"/reports/{report['hash']}"
+    return {"reports": reports}
+
+
+def _gunzip_chunks(path: Path):
+    with gzip.open(path, "rb") as f:
+        while chunk := f.read(64 * 1024):
+            yield chunk
+
+
+@app.get("/reports/{report_hash}")
+def get_report(request: Request, report_hash: str):
+    if not re.fullmatch(r"[0-9a-f]{32}", report_hash):
+        return PlainTextResponse("Report not found.", status_code=404)
+    pending = report_store.pending(report_hash)
+    path = report_store.path_for(report_hash)
+    if pending is None and not path.exists():
+        return PlainTextResponse("Report not found.", status_code=404)
+    # Content-addressed, so a report never changes once it exists; each
+    # encoding gets its own ETag, as for static assets.
+    gzipped = pending is None and accepts(request.headers.get("accept-encoding"), "gzip")
+    etag = f'"{report_hash}-gzip"' if gzipped else f'"{report_hash}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if pending is not None:
+        return Response(content=pending, media_type="text/html; charset=utf-8", headers=headers)
+    if gzipped:
+        # Served as stored: the gzip file goes out as-is via sendfile where the server supports it.
+        return FileResponse(path, media_type="text/html; charset=utf-8", headers={**headers, "Content-Encoding": "gzip"})
+    return StreamingResponse(_gunzip_chunks(path), media_type="text/html; charset=utf-8", headers=headers)
+
+
+@app.get("/static/{filename}")
+def static_asset(request: Request, filename: str):
+    asset = find_asset(filename)
+    if asset is None:
+        return PlainTextResponse("Not found.", status_code=404)
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    etag = asset.etag if encoding is None else f'{asset.etag[:-1]}-{encoding}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=asset.bodies[encoding], media_type=asset.media_type, headers=headers)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 
 @app.get("/")
 def root():
-    return {"status": "Server is running"}
\ No newline at end of file
+    return {"status": "Server is running"}
+
+
+@app.get("/ready")
+def ready():
+    # Readiness for load balancers: 503 until warm_up has finished. "/" only
+    # says the process is up.
+    status_code = 200 if readiness["ready"] else 503
+    return JSONResponse({"status": "ready" if readiness["ready"] else "warming", **readiness}, status_code=status_code)
+
+
+readiness["import_seconds"] = round(time.perf_counter() - IMPORT_STARTED, 3)
+if readiness["import_seconds"] > IMPORT_TIME_BUDGET:
+    logger.warning(f"Importing main took {readiness['import_seconds']}s, over the {IMPORT_TIME_BUDGET}s budget")
@@ -0,0 +1,180 @@
+import bisect
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+import httpx
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Upper bounds in seconds; Gemini calls land in the multi-second buckets.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+stage_histograms: dict[str, Histogram] = {}
+upstream_histograms: dict[str, Histogram] = {}
+request_histograms: dict[str, Histogram] = {}
+upstream_errors: dict[tuple[str, str], int] = {}
+_stats_sources: list[tuple[str, str, object]] = []
+
+_request_timings: ContextVar[dict | None] = ContextVar("request_timings", default=None)
+
+_NOOP = nullcontext()
+
+
+def _observe(histograms: dict[str, Histogram], name: str, value: float):
+    histogram = histograms.get(name)
+    if histogram is None:
+        histogram = histograms[name] = Histogram()
+    histogram.observe(value)
+
+
+@contextmanager
+def _timed_stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _observe(stage_histograms, name, elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def stage(name: str):
+    # Times one pipeline stage into its histogram and the current request's
+    # Server-Timing header. A shared no-op context when metrics are disabled.
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _timed_stage(name)
+
+
+class _UpstreamCall:
+    __slots__ = ("status",)
+
+    def __init__(self):
+        self.status = 200
+
+
+_NOOP_CALL = _UpstreamCall()
+
+
+@contextmanager
+def _timed_upstream_call(name: str):
+    call = _UpstreamCall()
+    start = time.perf_counter()
+    try:
+        yield call
+    except (httpx.TimeoutException, TimeoutError):
+        count_upstream_error(name, "timeout")
+        raise
+    except Exception:
+        count_upstream_error(name, "error")
+        raise
+    else:
+        if call.status >= 400:
+            count_upstream_error(name, f"http_{call.status // 100}xx")
+    finally:
+        _observe(upstream_histograms, name, time.perf_counter() - start)
+
+
+@contextmanager
+def _untimed_upstream_call():
+    yield _NOOP_CALL
+
+
+def upstream_call(name: str):
+    # Usage: with upstream_call("maps") as call: ...; call.status = response.status_code
+    if not METRICS_ENABLED:
+        return _untimed_upstream_call()
+    return _timed_upstream_call(name)
+
+
+def count_upstream_error(name: str, kind: str):
+    key = (name, kind)
+    upstream_errors[key] = upstream_errors.get(key, 0) + 1
+
+
+def register_stats(kind: str, name: str, source):
+    # source is a zero-argument callable returning a dict of numbers, e.g. a
+    # cache's stats method; it is sampled on every /metrics scrape.
+    _stats_sources.append((kind, name, source))
+
+
+class ServerTimingMiddleware:
+    # Pure ASGI middleware: collects stage timings for the request and emits
+    # them as a Server-Timing header, plus a per-route latency histogram.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        timings: dict[str, float] = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and timings:
+                header = ", ".join(f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in timings.items())
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            _observe(request_histograms, getattr(route, "path", "unmatched"), time.perf_counter() - start)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_histograms(lines: list[str], metric: str, label: str, histograms: dict[str, Histogram]):
+    lines.append(f"# TYPE {metric} histogram")
+    for name, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{{label}="{_label(name)}",le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{{label}="{_label(name)}",le="+Inf"}} {histogram.count}')
+        lines.append(f'{metric}_sum{{{label}="{_label(name)}"}} {histogram.total}')
+        lines.append(f'{metric}_count{{{label}="{_label(name)}"}} {histogram.count}')
+
+
+def render_prometheus() -> str:
+    lines = []
+    _render_histograms(lines, "justrip_stage_seconds", "stage", stage_histograms)
+    _render_histograms(lines, "justrip_upstream_request_seconds", "upstream", upstream_histograms)
+    _render_histograms(lines, "justrip_http_request_seconds", "route", request_histograms)
+
+    lines.append("# TYPE justrip_upstream_errors_total counter")
+    for (name, kind), count in sorted(upstream_errors.items()):
+        lines.append(f'justrip_upstream_errors_total{{upstream="{_label(name)}",kind="{_label(kind)}"}} {count}')
+
+    for kind, name, source in _stats_sources:
+        for key, value in source().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f'justrip_{kind}_{key}{{name="{_label(name)}"}} {value}')
+    return "\n".join(lines) + "\n"
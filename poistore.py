@@ -0,0 +1,196 @@
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from cache import normalize_text
+from itinerary import distance_km
+from recommendation import Recommendation
+
+logger = logging.getLogger(__name__)
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Stored cells are ~5 m across; a place is identified by its name and
+# address within a ~1 km cell, so a "National Museum" in each city, or each
+# branch of a chain, stays a separate place.
+GEOHASH_PRECISION = 9
+IDENTITY_PRECISION = 6
+# Bumped when the places table changes shape; older tables are rebuilt.
+SCHEMA_VERSION = 2
+KM_PER_DEGREE = 111.2
+
+
+def geohash(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    value = 0
+    bits = 0
+    even = True
+    while len(chars) < precision:
+        target, bounds = (lon, lon_range) if even else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        if target >= mid:
+            value = value * 2 + 1
+            bounds[0] = mid
+        else:
+            value *= 2
+            bounds[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            value = 0
+            bits = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    # (lat, lon) extent in degrees of a cell; longitude gets the odd bit.
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def covering_cells(lat: float, lon: float, radius_km: float) -> set[str]:
+    # Geohash prefixes covering the radius's bounding box, at the finest
+    # precision whose cells span at least half the radius (so at most a few
+    # dozen cells, never thousands).
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = min(180.0, radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01)))
+    precision = GEOHASH_PRECISION
+    while precision > 1:
+        cell_lat, cell_lon = cell_size(precision)
+        if 2 * cell_lat >= dlat and 2 * cell_lon >= dlon:
+            break
+        precision -= 1
+    cell_lat, cell_lon = cell_size(precision)
+    lats = [lat - dlat + i * cell_lat for i in range(math.ceil(2 * dlat / cell_lat) + 1)] + [lat + dlat]
+    lons = [lon - dlon + i * cell_lon for i in range(math.ceil(2 * dlon / cell_lon) + 1)] + [lon + dlon]
+    return {
+        geohash(min(90.0, max(-90.0, y)), (x + 180.0) % 360.0 - 180.0, precision)
+        for y in lats for x in lons
+    }
+
+
+def _cell_filter(cells: set[str]) -> tuple[str, list[str]]:
+    # Prefix matches as index range scans; "{" sorts right after "z".
+    clauses = " OR ".join("(geohash >= ? AND geohash < ?)" for _ in cells)
+    params = [bound for cell in sorted(cells) for bound in (cell, cell + "{")]
+    return f"({clauses})", params
+
+
+class PlaceStore:
+    # Recommendation places that have been geocoded before, with their
+    # standardized fields, in a SQLite table indexed by geohash. Shared by
+    # every worker on the host, like the disk tier of TTLCache.
+
+    def __init__(self, db_path: Path):
+        self.remembered = 0
+        self.lookups = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+        self._db = None
+        try:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(db_path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            # One worker migrates; the others wait on the write lock.
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if self._db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                    # Rows keyed without their address cannot be told apart.
+                    self._db.execute("DROP TABLE IF EXISTS places")
+                    self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS places ("
+                    "name_key TEXT NOT NULL, location_key TEXT NOT NULL, area TEXT NOT NULL, geohash TEXT NOT NULL, "
+                    "lat REAL NOT NULL, lon REAL NOT NULL, row TEXT NOT NULL, "
+                    "updated_at REAL NOT NULL, seen INTEGER NOT NULL DEFAULT 1, "
+                    "PRIMARY KEY (name_key, location_key, area))"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS places_geohash ON places (geohash)")
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Place store disabled ({e})")
+            self._db = None
+
+    def remember(self, items: list[Recommendation], generated: bool = True):
+        # generated is False for recommendations served again from a cache:
+        # their places are refreshed but not counted as seen once more.
+        rows = []
+        bump = 1 if generated else 0
+        now = time.time()
+        for item in items:
+            name_key = normalize_text(item.name)
+            if item.lat is None or item.lon is None or not name_key or item.name == "N/A":
+                continue
+            cell = geohash(item.lat, item.lon)
+            rows.append((name_key, normalize_text(item.location), cell[:IDENTITY_PRECISION], cell, item.lat, item.lon, json.dumps(item.to_row(), ensure_ascii=False), now, bump))
+        if not rows or self._db is None:
+            return
+        with self._lock:
+            try:
+                self._db.executemany(
+                    "INSERT INTO places (name_key, location_key, area, geohash, lat, lon, row, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(name_key, location_key, area) DO UPDATE SET geohash = excluded.geohash, lat = excluded.lat, "
+                    "lon = excluded.lon, row = excluded.row, updated_at = excluded.updated_at, seen = seen + ?",
+                    rows,
+                )
+                self.remembered += len(rows)
+            except sqlite3.Error as e:
+                logger.warning(f"Place store write failed: {e}")
+
+    def find(self, name: str, location: str, lat: float, lon: float, radius_km: float) -> tuple[float, float] | None:
+        # Coordinates of the nearest known place with this name and address
+        # within radius_km; a same-named place elsewhere (another branch of a
+        # chain) does not match.
+        name_key = normalize_text(name)
+        location_key = normalize_text(location)
+        if not name_key or not location_key or self._db is None:
+            return None
+        self.lookups += 1
+        cells, params = _cell_filter(covering_cells(lat, lon, radius_km))
+        with self._lock:
+            try:
+                rows = self._db.execute(f"SELECT lat, lon FROM places WHERE name_key = ? AND location_key = ? AND {cells}", [name_key, location_key, *params]).fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"Place store read failed: {e}")
+                return None
+        best = None
+        for place_lat, place_lon in rows:
+            distance = distance_km(lat, lon, place_lat, place_lon)
+            if distance <= radius_km and (best is None or distance < best[0]):
+                best = (distance, place_lat, place_lon)
+        if best is None:
+            return None
+        self.reused += 1
+        return best[1], best[2]
+
+    def nearby(self, lat: float, lon: float, radius_km: float, limit: int = 10) -> list[Recommendation]:
+        # Known places within radius_km, most often recommended first.
+        if self._db is None:
+            return []
+        cells, params = _cell_filter(covering_cells(lat, lon, radius_km))
+        with self._lock:
+            try:
+                rows = self._db.execute(f"SELECT lat, lon, row, seen FROM places WHERE {cells}", params).fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"Place store read failed: {e}")
+                return []
+        ranked = []
+        for place_lat, place_lon, row, seen in rows:
+            distance = distance_km(lat, lon, place_lat, place_lon)
+            if distance <= radius_km:
+                ranked.append((-seen, distance, row))
+        ranked.sort(key=lambda entry: entry[:2])
+        return [Recommendation.from_row(json.loads(row)) for _, _, row in ranked[:limit]]
+
+    def stats(self) -> dict:
+        return {"remembered": self.remembered, "lookups": self.lookups, "reused": self.reused}
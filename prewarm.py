@@ -0,0 +1,143 @@
+import asyncio
+import heapq
+import logging
+import math
+import os
+import time
+from contextlib import contextmanager
+
+from admission import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "true").lower() in ("1", "true", "yes")
+PREWARM_INTERVAL = float(os.getenv("PREWARM_INTERVAL", "300"))
+PREWARM_TOP_N = int(os.getenv("PREWARM_TOP_N", "20"))
+# Entries expiring within this many seconds are refreshed; at least the
+# interval, so nothing popular expires between two cycles.
+PREWARM_REFRESH_AHEAD = float(os.getenv("PREWARM_REFRESH_AHEAD", str(PREWARM_INTERVAL + 60)))
+# Popularity halves every PREWARM_HALF_LIFE seconds without queries, and a
+# destination needs PREWARM_MIN_SCORE to be worth warming at all.
+PREWARM_HALF_LIFE = float(os.getenv("PREWARM_HALF_LIFE", "3600"))
+PREWARM_MIN_SCORE = float(os.getenv("PREWARM_MIN_SCORE", "3"))
+PREWARM_MAX_TRACKED = int(os.getenv("PREWARM_MAX_TRACKED", "10000"))
+# Upstream calls pre-warming may spend (0 turns it off), and the number of
+# live requests in flight above which it backs off until the next cycle.
+PREWARM_CALLS_PER_MINUTE = float(os.getenv("PREWARM_CALLS_PER_MINUTE", "20"))
+PREWARM_MAX_LIVE_REQUESTS = int(os.getenv("PREWARM_MAX_LIVE_REQUESTS", "2"))
+
+
+class Popularity:
+    # Exponentially decayed query counts. Scores are stored as of their last
+    # update and decayed on read, so recording stays O(1).
+
+    def __init__(self, half_life: float = PREWARM_HALF_LIFE, max_tracked: int = PREWARM_MAX_TRACKED):
+        self.decay = math.log(2) / half_life
+        self.max_tracked = max_tracked
+        self._scores: dict[str, tuple[float, float, object]] = {}
+
+    def _score(self, entry: tuple[float, float, object], now: float) -> float:
+        return entry[0] * math.exp(-self.decay * (now - entry[1]))
+
+    def record(self, key: str, value):
+        now = time.monotonic()
+        entry = self._scores.get(key)
+        score = 1.0 if entry is None else self._score(entry, now) + 1.0
+        self._scores[key] = (score, now, value)
+        if len(self._scores) > self.max_tracked:
+            self._prune(now)
+
+    def _prune(self, now: float):
+        # Keeps the top three quarters; amortised over the inserts in between.
+        keep = heapq.nlargest(self.max_tracked * 3 // 4, self._scores.items(), key=lambda item: self._score(item[1], now))
+        self._scores = dict(keep)
+
+    def top(self, n: int, min_score: float = 0.0) -> list:
+        now = time.monotonic()
+        ranked = heapq.nlargest(n, ((self._score(entry, now), entry[2]) for entry in self._scores.values()), key=lambda pair: pair[0])
+        return [value for score, value in ranked if score >= min_score]
+
+    def __len__(self):
+        return len(self._scores)
+
+
+class Prewarmer:
+    # Every interval, refreshes the cached results of the most popular
+    # destinations before they expire. refresh(destination, permit) does the
+    # work and must await permit() before each upstream call; permit() returns
+    # False when live traffic or an unhealthy upstream means the cycle should
+    # stop, so pre-warming only ever uses spare upstream capacity.
+
+    def __init__(self, refresh, healthy=lambda: True, popularity: Popularity | None = None):
+        self.refresh = refresh
+        self.healthy = healthy
+        self.popularity = popularity or Popularity()
+        self.bucket = TokenBucket(PREWARM_CALLS_PER_MINUTE) if PREWARM_CALLS_PER_MINUTE > 0 else None
+        self.live_requests = 0
+        self.cycles = 0
+        self.calls = 0
+        self.deferred = 0
+        self.failures = 0
+        self._task: asyncio.Task | None = None
+
+    def record(self, key: str, destination):
+        self.popularity.record(key, destination)
+
+    @contextmanager
+    def live(self):
+        self.live_requests += 1
+        try:
+            yield
+        finally:
+            self.live_requests -= 1
+
+    def _busy(self) -> bool:
+        return self.live_requests > PREWARM_MAX_LIVE_REQUESTS or not self.healthy()
+
+    async def permit(self) -> bool:
+        if self.bucket is None or self._busy():
+            return False
+        await self.bucket.acquire()
+        # Live traffic may have arrived while waiting for the token.
+        if self._busy():
+            return False
+        self.calls += 1
+        return True
+
+    def start(self):
+        if PREWARM_ENABLED and self.bucket is not None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(PREWARM_INTERVAL)
+            await self.run_once()
+
+    async def run_once(self):
+        self.cycles += 1
+        for destination in self.popularity.top(PREWARM_TOP_N, PREWARM_MIN_SCORE):
+            if self._busy():
+                self.deferred += 1
+                return
+            try:
+                if not await self.refresh(destination, self.permit):
+                    self.deferred += 1
+                    return
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"Pre-warming {destination} failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "tracked": len(self.popularity),
+            "cycles": self.cycles,
+            "upstream_calls": self.calls,
+            "deferred": self.deferred,
+            "failures": self.failures,
+            "live_requests": self.live_requests,
+        }
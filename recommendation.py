@@ -0,0 +1,233 @@
+import json
+import logging
+import re
+from dataclasses import dataclass
+
+from streamparse import JSONArrayStreamParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+URL_PROTOCOL_REGEX = re.compile(r'^(http|https)://', re.IGNORECASE)
+_TRAILING_COMMA_REGEX = re.compile(r',\s*([}\]])')
+_COMMENT_REGEX = re.compile(r'^\s*//[^\n]*$|/\*.*?\*/', re.DOTALL | re.MULTILINE)
+
+# Responses longer than this are not worth regex repair; we only salvage the
+# complete objects from them.
+MAX_REPAIR_CHARS = 64 * 1024
+
+# Gemini JSON-mode schema (OpenAPI subset) for the recommendation array.
+RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "name": {"type": "STRING"},
+            "location": {"type": "STRING"},
+            "travel_time": {"type": "STRING"},
+            "description": {"type": "STRING"},
+            "website": {"type": "STRING"},
+            "cost_krw": {"type": "NUMBER"},
+            "cost_usd": {"type": "NUMBER"},
+            "recommended_clothing": {"type": "STRING"},
+            "recommended_essentials": {"type": "STRING"},
+        },
+        "required": ["name", "location", "description"],
+        "propertyOrdering": [
+            "name", "location", "travel_time", "description", "website",
+            "cost_krw", "cost_usd", "recommended_clothing", "recommended_essentials",
+        ],
+    },
+}
+
+# One entry per location when several trips are packed into one prompt.
+BATCH_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "index": {"type": "INTEGER"},
+            "recommendations": RESPONSE_SCHEMA,
+        },
+        "required": ["index", "recommendations"],
+        "propertyOrdering": ["index", "recommendations"],
+    },
+}
+
+# How often each parse path is taken; exposed for monitoring.
+PARSE_STATS = {"direct": 0, "repaired": 0, "salvaged": 0, "failed": 0}
+
+
+def loads(text):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _to_float(value) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.replace(",", "").strip() or 0)
+        except ValueError:
+            return 0.0
+    return 0.0
+
+
+def _to_str(value) -> str:
+    if value is None:
+        return "N/A"
+    return value if isinstance(value, str) else str(value)
+
+
+@dataclass(slots=True)
+class Recommendation:
+    name: str = "N/A"
+    location: str = "N/A"
+    travel_time: str = "N/A"
+    description: str = "N/A"
+    website: str = "N/A"
+    cost_krw: float = 0.0
+    cost_usd: float = 0.0
+    clothing: str = "N/A"
+    essentials: str = "N/A"
+    lat: float | None = None
+    lon: float | None = None
+    # Filled in by itinerary planning: the leg from the previous stop.
+    leg_km: float | None = None
+    leg_minutes: int | None = None
+
+    @classmethod
+    def from_model(cls, item: dict) -> "Recommendation":
+        website = _to_str(item.get("website", "N/A"))
+        if website != "N/A" and website.strip() and not URL_PROTOCOL_REGEX.match(website):
+            website = "https://" + website
+        return cls(
+            _to_str(item.get("name", "N/A")),
+            _to_str(item.get("location", "N/A")),
+            _to_str(item.get("travel_time", "N/A")),
+            _to_str(item.get("description", "N/A")),
+            website,
+            _to_float(item.get("cost_krw", 0.0)),
+            _to_float(item.get("cost_usd", 0.0)),
+            _to_str(item.get("recommended_clothing", "N/A")),
+            _to_str(item.get("recommended_essentials", "N/A")),
+        )
+
+    @classmethod
+    def from_row(cls, row: list) -> "Recommendation":
+        return cls(*row)
+
+    def to_row(self) -> list:
+        return [
+            self.name, self.location, self.travel_time, self.description, self.website,
+            self.cost_krw, self.cost_usd, self.clothing, self.essentials, self.lat, self.lon,
+        ]
+
+    def to_dict(self) -> dict:
+        # The original public field names, kept for /weather/json clients.
+        return {
+            "Name of Place": self.name,
+            "Location": self.location,
+            "Estimated Travel Time": self.travel_time,
+            "Description": self.description,
+            "Website": self.website,
+            "Cost_KRW": self.cost_krw,
+            "Cost_USD": self.cost_usd,
+            "Recommended_Clothing": self.clothing,
+            "Recommended_Essentials": self.essentials,
+            "lat": self.lat,
+            "lon": self.lon,
+            "Leg_Distance_km": self.leg_km,
+            "Leg_Travel_Minutes": self.leg_minutes,
+        }
+
+
+def _to_recommendations(parsed) -> list[Recommendation]:
+    if isinstance(parsed, dict):
+        logger.warning("AI response is a single JSON object; wrapping it in a list.")
+        parsed = [parsed]
+    if not isinstance(parsed, list):
+        return []
+    return [Recommendation.from_model(item) for item in parsed if isinstance(item, dict)]
+
+
+def _strip_fence(text: str) -> str:
+    start = text.find("```")
+    if start < 0:
+        return text
+    body_start = text.find("\n", start)
+    end = text.find("```", body_start + 1) if body_start >= 0 else -1
+    if body_start < 0:
+        return text[start + 3:]
+    return text[body_start + 1:end if end >= 0 else len(text)]
+
+
+def decode_ai_json(json_string: str):
+    # Returns the decoded JSON value, or None when even salvage fails.
+    if not json_string:
+        PARSE_STATS["failed"] += 1
+        return None
+
+    try:
+        parsed = loads(json_string)
+        PARSE_STATS["direct"] += 1
+        return parsed
+    except ValueError:
+        pass
+
+    # Repair path for responses that did not come back in JSON mode: drop a
+    # code fence and any prose around the array, then fix trailing commas and
+    # comments. Cost is bounded by MAX_REPAIR_CHARS.
+    text = _strip_fence(json_string)
+    start = text.find("[")
+    end = text.rfind("]")
+    if start >= 0 and end > start:
+        text = text[start:end + 1]
+    if len(text) <= MAX_REPAIR_CHARS:
+        text = _TRAILING_COMMA_REGEX.sub(r'\1', _COMMENT_REGEX.sub('', text))
+        try:
+            parsed = loads(text)
+            PARSE_STATS["repaired"] += 1
+            return parsed
+        except ValueError:
+            pass
+
+    # Last resort, e.g. a response cut off mid-array: keep every complete object.
+    salvaged = JSONArrayStreamParser().feed(json_string)
+    if salvaged:
+        PARSE_STATS["salvaged"] += 1
+        return salvaged
+
+    PARSE_STATS["failed"] += 1
+    logger.error(f"Failed to decode JSON from AI response. Raw response: {json_string[:500]}")
+    return None
+
+
+def parse_ai_response(json_string: str) -> list[Recommendation]:
+    return _to_recommendations(decode_ai_json(json_string))
+
+
+def parse_batch_response(json_string: str) -> dict[int, list[Recommendation]]:
+    parsed = decode_ai_json(json_string)
+    if isinstance(parsed, dict):
+        parsed = [parsed]
+    if not isinstance(parsed, list):
+        return {}
+    results = {}
+    for entry in parsed:
+        if not isinstance(entry, dict) or not isinstance(entry.get("index"), int):
+            continue
+        results[entry["index"]] = _to_recommendations(entry.get("recommendations") or [])
+    return results
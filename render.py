@@ -0,0 +1,244 @@
+import string
+
+from assets import asset_text, asset_url
+from recommendation import Recommendation
+from trip import TripResult, format_budget, format_cost, format_dates, format_interests, format_leg
+
+
+def html_escape(text):
+    if text is None:
+        return ''
+    return str(text).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;').replace("'", '&#39;')
+
+
+def render_json(result: TripResult) -> dict:
+    body = {
+        "location": result.location,
+        "coordinates": {"lat": result.lat, "lon": result.lon},
+        "temperature_celsius": result.temperature,
+        "description": result.description,
+        "humidity": result.humidity,
+        "budget": format_budget(result.budget_krw),
+        "interests": result.interests,
+        "ai_recommendations": [item.to_dict() for item in result.recommendations]
+    }
+    if result.date is not None:
+        body["date"] = result.date.isoformat()
+        body["end_date"] = (result.end_date or result.date).isoformat()
+        body["daily_forecast"] = [day.to_dict() for day in result.daily]
+    return body
+
+
+COMPACT_VERSION = 1
+# Short keys of the compact format, in output order. Within a version they
+# are never renamed or reused; a change of meaning needs a new version.
+COMPACT_FIELDS = {
+    "n": "name",
+    "a": "location",
+    "tt": "travel_time",
+    "d": "description",
+    "w": "website",
+    "krw": "cost_krw",
+    "usd": "cost_usd",
+    "cl": "clothing",
+    "es": "essentials",
+    "lat": "lat",
+    "lon": "lon",
+    "km": "leg_km",
+    "min": "leg_minutes",
+}
+
+
+def parse_compact_fields(fields: str | None) -> tuple[str, ...]:
+    # "n,lat,lon" -> ("n", "lat", "lon") in canonical order, so equivalent
+    # projections share one memoized rendering.
+    if not fields:
+        return tuple(COMPACT_FIELDS)
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - COMPACT_FIELDS.keys()
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. Known: {', '.join(COMPACT_FIELDS)}")
+    return tuple(key for key in COMPACT_FIELDS if key in requested)
+
+
+def render_compact(result: TripResult, fields: tuple[str, ...], offset: int = 0, limit: int | None = None) -> dict:
+    attributes = [(key, COMPACT_FIELDS[key]) for key in fields]
+    end = len(result.recommendations) if limit is None else offset + limit
+    body = {
+        "v": COMPACT_VERSION,
+        "loc": result.location,
+        "lat": result.lat,
+        "lon": result.lon,
+        "t": result.temperature,
+        "d": result.description,
+        "h": result.humidity,
+        "recs": [{key: getattr(item, name) for key, name in attributes} for item in result.recommendations[offset:end]],
+        "total": len(result.recommendations),
+    }
+    if end < len(result.recommendations):
+        body["next"] = end
+    if result.date is not None:
+        body["date"] = result.date.isoformat()
+        body["end"] = (result.end_date or result.date).isoformat()
+        # One [date, temperature, description, humidity] row per day.
+        body["daily"] = [[day.date.isoformat(), day.temperature, day.description, day.humidity] for day in result.daily]
+    return body
+
+
+def render_text(result: TripResult) -> str:
+    recommendations_text = "".join(
+        f"  - Name: {item.name}\n"
+        f"    Location: {item.location}\n"
+        f"    Travel Time: {item.travel_time}\n"
+        f"    Route Leg: {format_leg(item)}\n"
+        f"    Description: {item.description}\n"
+        f"    Website: {item.website}\n"
+        f"    Cost: {format_cost(item)}\n"
+        f"    Recommended Clothing: {item.clothing}\n"
+        f"    Recommended Essentials: {item.essentials}\n\n"
+        for item in result.recommendations
+    )
+
+    forecast_line = f"Forecast For: {format_dates(result)}\n" if result.date is not None else ""
+    return (
+        f"Weather Report for {result.location}\n"
+        f"-----------------------------------\n"
+        f"Coordinates: Lat {result.lat}, Lon {result.lon}\n"
+        f"{forecast_line}"
+        f"Temperature: {result.temperature}°C\n"
+        f"Description: {result.description}\n"
+        f"Humidity: {result.humidity}%\n"
+        f"Budget Considered: {format_budget(result.budget_krw)}\n"
+        f"Interests: {format_interests(result.interests)}\n\n"
+        f"AI Recommendations:\n"
+        f"-------------------------------\n"
+        f"{recommendations_text}"
+    )
+
+
+class Template:
+    # A str.format-style template split into literals and field names once,
+    # at import time; render() only joins pre-escaped values into it.
+    __slots__ = ("_parts",)
+
+    def __init__(self, source: str):
+        self._parts = [(literal, field) for literal, field, _, _ in string.Formatter().parse(source)]
+
+    def render(self, values: dict) -> str:
+        out = []
+        for literal, field in self._parts:
+            out.append(literal)
+            if field is not None:
+                out.append(values[field])
+        return "".join(out)
+
+
+ITEM_TEMPLATE = Template("""
+                <li{coordinates}>
+                    <b>{name}</b><br>
+                    Location: {location}<br>
+                    Travel Time: {travel_time}<br>
+                    Route Leg: {leg}<br>
+                    Description: {description}<br>
+                    Website: {website}<br>
+                    Cost: {cost}<br>
+                    <b>Recommended Clothing:</b> {clothing}<br>
+                    <b>Recommended Essentials:</b> {essentials}
+                </li>
+                """)
+
+RAW_AI_TEMPLATE = Template("""
+        <h3>Raw Gemini AI Response (JSON)</h3>
+        <pre>{raw_ai}</pre>
+        """)
+
+PAGE_TEMPLATE = Template("""
+    <!DOCTYPE html>
+    <html lang="en">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>Weather Report for {location}</title>
+        {stylesheet}
+    </head>
+    <body>
+        <h2>Weather in {location}</h2>
+        {forecast}
+        <p><b>Temperature:</b> {temperature}°C</p>
+        <p><b>Description:</b> {description}</p>
+        <p><b>Humidity:</b> {humidity}%</p>
+        <p><b>Interests:</b> {interests}</p>
+
+        <h3>AI Recommendations (Budget: {budget})</h3>
+        <ul>
+            {items}
+        </ul>
+        {raw_ai_section}
+
+
+        <h3>Recommended Locations on Map</h3>
+        <div id="map" data-lat="{lat}" data-lng="{lon}" data-label="{location}" data-maps-key="{maps_api_key}"></div>
+
+        {script}
+    </body>
+    </html>
+    """)
+
+
+def _recommendation_html(item: Recommendation) -> str:
+    # Every field is escaped exactly once; the map reuses this markup for the
+    # marker's info window.
+    website = item.website
+    if website != "N/A":
+        website = html_escape(website)
+        website_html = f'<a href="{website}" target="_blank">{website}</a>'
+    else:
+        website_html = "N/A"
+    if item.lat is not None and item.lon is not None:
+        coordinates = f' data-lat="{item.lat}" data-lng="{item.lon}"'
+    else:
+        coordinates = ""
+    return ITEM_TEMPLATE.render({
+        "coordinates": coordinates,
+        "name": html_escape(item.name),
+        "location": html_escape(item.location),
+        "travel_time": html_escape(item.travel_time),
+        "leg": html_escape(format_leg(item)),
+        "description": html_escape(item.description),
+        "website": website_html,
+        "cost": html_escape(format_cost(item)),
+        "clothing": html_escape(item.clothing),
+        "essentials": html_escape(item.essentials),
+    })
+
+
+def render_html(result: TripResult, maps_api_key: str, include_raw: bool = False, inline_assets: bool = False) -> str:
+    # inline_assets embeds the stylesheet and map script, for saved reports
+    # that are opened without the server.
+    if inline_assets:
+        stylesheet = f"<style>\n{asset_text('report.css')}</style>"
+        script = f"<script>\n{asset_text('report.js')}</script>"
+    else:
+        stylesheet = f'<link rel="stylesheet" href="{asset_url("report.css")}">'
+        script = f'<script src="{asset_url("report.js")}" defer></script>'
+
+    raw_ai_section = ""
+    if include_raw:
+        raw_ai_section = RAW_AI_TEMPLATE.render({"raw_ai": html_escape(result.raw_ai)})
+
+    return PAGE_TEMPLATE.render({
+        "location": html_escape(result.location),
+        "stylesheet": stylesheet,
+        "forecast": f"<p><b>Forecast for:</b> {html_escape(format_dates(result))}</p>" if result.date is not None else "",
+        "temperature": html_escape(result.temperature),
+        "description": html_escape(result.description),
+        "humidity": html_escape(result.humidity),
+        "interests": html_escape(format_interests(result.interests)),
+        "budget": html_escape(format_budget(result.budget_krw)),
+        "items": "".join(_recommendation_html(item) for item in result.recommendations),
+        "raw_ai_section": raw_ai_section,
+        "lat": html_escape(result.lat),
+        "lon": html_escape(result.lon),
+        "maps_api_key": html_escape(maps_api_key),
+        "script": script,
+    })
@@ -0,0 +1,124 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class ReportStore:
+    # Content-addressed store for saved HTML reports. Each distinct report is
+    # written once, gzip-compressed, to objects/<hh>/<hash>.html.gz by a
+    # background writer; a SQLite index keeps (hash, location, saved_at) rows
+    # for listing. Saving the same report again only refreshes its index row.
+
+    def __init__(self, directory: Path, queue_size: int = 256):
+        self.directory = Path(directory)
+        self.objects = self.directory / "objects"
+        self.saved = 0
+        self.deduplicated = 0
+        self.write_failures = 0
+        self._queue: asyncio.Queue | None = None
+        self._queue_size = queue_size
+        self._writer: asyncio.Task | None = None
+        # Reports accepted but not yet on disk, so they can already be served.
+        self._pending: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.directory / "index.sqlite3", timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS reports ("
+            "hash TEXT PRIMARY KEY, location TEXT NOT NULL, saved_at REAL NOT NULL, "
+            "size INTEGER NOT NULL, saves INTEGER NOT NULL DEFAULT 1)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS reports_saved_at ON reports (saved_at)")
+
+    def path_for(self, report_hash: str) -> Path:
+        return self.objects / report_hash[:2] / f"{report_hash}.html.gz"
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self._queue_size)
+        self._writer = asyncio.create_task(self._run())
+
+    async def close(self):
+        # Drains the queue so every accepted report reaches the disk.
+        if self._writer is None:
+            return
+        await self._queue.put(None)
+        await self._writer
+        self._writer = None
+        self._db.close()
+
+    async def save(self, location: str, html: str) -> str:
+        body = html.encode("utf-8")
+        report_hash = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.saved += 1
+        if report_hash in self._pending or self.path_for(report_hash).exists():
+            self.deduplicated += 1
+            self._index(report_hash, location, len(body))
+            return report_hash
+        self._pending[report_hash] = body
+        await self._queue.put((report_hash, location, body))
+        return report_hash
+
+    async def _run(self):
+        while True:
+            job = await self._queue.get()
+            if job is None:
+                return
+            report_hash, location, body = job
+            try:
+                await asyncio.to_thread(self._write, report_hash, body)
+                self._index(report_hash, location, len(body))
+            except (OSError, sqlite3.Error) as e:
+                self.write_failures += 1
+                logger.error(f"Failed to save report {report_hash}: {e}")
+            finally:
+                self._pending.pop(report_hash, None)
+
+    def _write(self, report_hash: str, body: bytes):
+        path = self.path_for(report_hash)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".tmp{os.getpid()}")
+        tmp.write_bytes(gzip.compress(body, mtime=0))
+        os.replace(tmp, path)
+
+    def _index(self, report_hash: str, location: str, size: int):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO reports (hash, location, saved_at, size) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(hash) DO UPDATE SET saved_at = excluded.saved_at, saves = saves + 1",
+                (report_hash, location, time.time(), size),
+            )
+
+    def recent(self, limit: int = 50, offset: int = 0, location: str | None = None) -> list[dict]:
+        query = "SELECT hash, location, saved_at, size, saves FROM reports"
+        params: list = []
+        if location:
+            query += " WHERE location LIKE ?"
+            params.append(f"%{location}%")
+        query += " ORDER BY saved_at DESC LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [
+            {"hash": h, "location": loc, "saved_at": saved_at, "size": size, "saves": saves}
+            for h, loc, saved_at, size, saves in rows
+        ]
+
+    def pending(self, report_hash: str) -> bytes | None:
+        return self._pending.get(report_hash)
+
+    def stats(self) -> dict:
+        return {
+            "saved": self.saved,
+            "deduplicated": self.deduplicated,
+            "write_failures": self.write_failures,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import admission
+import metrics
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "30"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+# A call is not started with less time than this left; it could only time out.
+UPSTREAM_MIN_CALL_SECONDS = float(os.getenv("UPSTREAM_MIN_CALL_SECONDS", "0.05"))
+
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+HEDGE_STATS = {"launched": 0, "won": 0}
+
+
+class UpstreamUnavailable(Exception):
+    pass
+
+
+class DeadlineExceeded(UpstreamUnavailable, TimeoutError):
+    pass
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+@contextmanager
+def deadline(seconds: float = REQUEST_DEADLINE):
+    # Sets the request's deadline unless an outer scope already set an
+    # earlier one. Tasks created inside inherit it.
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(current, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def budget(cap: float | None = None, reserve: float = 0.0) -> float | None:
+    # Time a stage may spend: at most cap, minus the reserve kept for the
+    # stages after it (at most half of what is left). Raises once nothing is.
+    left = remaining()
+    if left is None:
+        return cap
+    if left <= 0:
+        raise DeadlineExceeded("request deadline exceeded")
+    left -= min(reserve, left / 2)
+    return left if cap is None else min(cap, left)
+
+
+class CircuitBreaker:
+    # Opens after failure_threshold consecutive failures and rejects calls
+    # until reset_timeout has passed; then one trial call is let through
+    # (half-open) and its outcome closes or re-opens the circuit.
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self.rejected = 0
+        self._trial_in_flight = False
+
+    def before_call(self):
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return
+        self.rejected += 1
+        raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def record_success(self):
+        self.failures = 0
+        self._trial_in_flight = False
+        if self.state != self.CLOSED:
+            logger.info(f"{self.name} circuit closed")
+        self.state = self.CLOSED
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            if self.state == self.CLOSED:
+                logger.warning(f"{self.name} circuit opened after {self.failures} consecutive failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.opens += 1
+
+    def record_cancel(self):
+        # A cancelled trial (e.g. a losing hedge) says nothing about health.
+        self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "opens": self.opens, "rejected": self.rejected}
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def breaker(name: str) -> CircuitBreaker:
+    circuit = _breakers.get(name)
+    if circuit is None:
+        circuit = _breakers[name] = CircuitBreaker(name)
+        metrics.register_stats("circuit", name, circuit.stats)
+    return circuit
+
+
+async def guarded(name: str, request, timeout: float | None = None, reserve: float = 0.0):
+    # Runs request() (returning an httpx.Response) behind the upstream's
+    # circuit breaker and concurrency limit, timed into metrics. The call
+    # gets timeout seconds, or what budget(timeout, reserve) leaves once a
+    # slot is free if that is less. 5xx and 429 answers count as failures
+    # but are returned to the caller.
+    circuit = breaker(name)
+    try:
+        circuit.before_call()
+    except CircuitOpenError:
+        metrics.count_upstream_error(name, "circuit_open")
+        raise
+    calling = False
+    try:
+        queue_timeout = budget(admission.UPSTREAM_QUEUE_TIMEOUT, reserve)
+        async with admission.limit(name).slot(queue_timeout):
+            call_timeout = budget(timeout, reserve)
+            if call_timeout is not None and call_timeout < UPSTREAM_MIN_CALL_SECONDS:
+                raise DeadlineExceeded(f"{name}: request deadline too close to call")
+            calling = True
+            # Only a call that had its whole timeout can blame the upstream
+            # for running out of it.
+            response = await _timed_call(name, circuit, request, call_timeout, blame_timeout=call_timeout == timeout)
+    except admission.Overloaded:
+        circuit.record_cancel()
+        metrics.count_upstream_error(name, "overloaded")
+        raise
+    except BaseException as e:
+        # Cancelled or out of time before the call started (a losing hedge,
+        # shutdown, a spent deadline): release a half-open trial without a
+        # verdict. Once it ran, _timed_call has recorded the outcome.
+        if not calling:
+            circuit.record_cancel()
+            if isinstance(e, DeadlineExceeded):
+                metrics.count_upstream_error(name, "deadline")
+        raise
+    if response.status_code >= 500 or response.status_code == 429:
+        circuit.record_failure()
+    else:
+        circuit.record_success()
+    return response
+
+
+async def _timed_call(name: str, circuit: CircuitBreaker, request, timeout: float | None, blame_timeout: bool = True):
+    try:
+        with metrics.upstream_call(name) as call:
+            try:
+                response = await asyncio.wait_for(request(), timeout)
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(f"{name} call exceeded its {timeout:.2f}s budget") from None
+            call.status = response.status_code
+    except asyncio.CancelledError:
+        circuit.record_cancel()
+        raise
+    except DeadlineExceeded:
+        if blame_timeout:
+            circuit.record_failure()
+        else:
+            circuit.record_cancel()
+        raise
+    except Exception:
+        circuit.record_failure()
+        raise
+    return response
+
+
+async def hedged(fn, delay: float | None, attempts: int = 2):
+    # Starts fn(); if it has not finished after delay seconds, starts another
+    # copy, up to attempts in total. The first success wins and the rest are
+    # cancelled. A failure before the delay starts the next copy at once.
+    if not delay or attempts <= 1:
+        return await fn()
+    first = asyncio.ensure_future(fn())
+    tasks: set[asyncio.Task] = set()
+    error: BaseException | None = None
+    try:
+        for attempt in range(attempts):
+            if attempt == 0:
+                tasks.add(first)
+            else:
+                HEDGE_STATS["launched"] += 1
+                tasks.add(asyncio.ensure_future(fn()))
+            wait = delay if attempt < attempts - 1 else None
+            while tasks:
+                done, _ = await asyncio.wait(tasks, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        if task is not first:
+                            HEDGE_STATS["won"] += 1
+                        return task.result()
+                    error = task.exception()
+                if attempt < attempts - 1:
+                    break
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
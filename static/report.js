@@ -0,0 +1,83 @@
+// Map for the weather report page. The traveller's position and the Maps key
+// come from data attributes on #map; each recommendation <li data-lat data-lng>
+// becomes a marker whose info window reuses the list item's markup.
+
+const MY_LOCATION_MARKER_COLOR = "blue";
+
+let map;
+let markers = [];
+let infoWindows = [];
+
+async function initMap() {
+    const mapElement = document.getElementById("map");
+    const mapsLib = await google.maps.importLibrary("maps");
+    const markerLib = await google.maps.importLibrary("marker");
+    const Map = mapsLib.Map;
+    const AdvancedMarkerElement = markerLib.AdvancedMarkerElement;
+    const here = { lat: parseFloat(mapElement.dataset.lat), lng: parseFloat(mapElement.dataset.lng) };
+
+    map = new Map(mapElement, {
+        zoom: 12,
+        center: here,
+        mapId: "DEMO_MAP_ID",
+    });
+
+    const svgIcon = document.createElement("div");
+    svgIcon.innerHTML = `
+        <svg width="24" height="24" viewBox="0 0 24 24" fill="` + MY_LOCATION_MARKER_COLOR + `" xmlns="http://www.w3.org/2000/svg">
+            <path d="M12 2C8.13 2 5 5.13 5 9c0 5.25 7 13 7 13s7-7.75 7-13c0-3.87-3.13-7-7-7zm0 9.5c-1.38 0-2.5-1.12-2.5-2.5S10.62 6.5 12 6.5s2.5 1.12 2.5 2.5-1.12 2.5-2.5 2.5z"/>
+        </svg>
+    `;
+
+    const currentMarker = new AdvancedMarkerElement({
+        map: map,
+        position: here,
+        title: "Your Current Location",
+        content: svgIcon
+    });
+    const hereContent = document.createElement("div");
+    hereContent.innerHTML = "<b>You Are Here:</b><br>";
+    hereContent.appendChild(document.createTextNode(mapElement.dataset.label));
+    const currentInfoWindow = new google.maps.InfoWindow({ content: hereContent });
+    currentMarker.addListener("click", () => {
+        currentInfoWindow.open(map, currentMarker);
+    });
+    markers.push(currentMarker);
+    infoWindows.push(currentInfoWindow);
+
+    document.querySelectorAll("li[data-lat]").forEach((item) => {
+        const marker = new AdvancedMarkerElement({
+            map: map,
+            position: { lat: parseFloat(item.dataset.lat), lng: parseFloat(item.dataset.lng) },
+            title: item.querySelector("b").textContent,
+        });
+
+        const infoWindow = new google.maps.InfoWindow({
+            content: item.innerHTML,
+        });
+
+        marker.addListener("click", () => {
+            infoWindows.forEach(iw => iw.close());
+            infoWindow.open(map, marker);
+        });
+
+        markers.push(marker);
+        infoWindows.push(infoWindow);
+    });
+
+    if (markers.length > 0) {
+        const bounds = new google.maps.LatLngBounds();
+        markers.forEach(marker => bounds.extend(marker.position));
+        map.fitBounds(bounds);
+    }
+}
+
+window.initMap = initMap;
+
+(function loadMapsApi() {
+    const script = document.createElement("script");
+    script.src = "https://maps.googleapis.com/maps/api/js?key=" + encodeURIComponent(document.getElementById("map").dataset.mapsKey)
+        + "&callback=initMap&v=beta&libraries=marker";
+    script.async = true;
+    document.head.appendChild(script);
+})();
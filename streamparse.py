@@ -0,0 +1,96 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class JSONArrayStreamParser:
+    # Incrementally extracts the top-level objects of a JSON array from text
+    # that arrives in arbitrary chunks (e.g. a streamed model response, which
+    # may also be wrapped in a ```json fence or follow some prose). The array
+    # starts at the first "[" whose next non-blank character is "{" or "]";
+    # a bracket in the prose before it is skipped. Each object is decoded
+    # once, as soon as its closing brace arrives.
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        # Seen a "[" and waiting for the character that says whether it opens the array.
+        self._opening = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = -1
+        self.failed_objects = 0
+
+    def feed(self, chunk: str) -> list[dict]:
+        self._buffer += chunk
+        completed = []
+        buffer = self._buffer
+        i = self._pos
+        end = len(buffer)
+        if self._finished:
+            i = end
+        while i < end:
+            ch = buffer[i]
+            if not self._in_array:
+                if self._opening and not ch.isspace():
+                    self._opening = False
+                    if ch == "{":
+                        self._in_array = True
+                        continue
+                    if ch == "]":
+                        self._finished = True
+                        i = end
+                        break
+                if ch == "[":
+                    self._opening = True
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{" or ch == "[":
+                if self._depth == 0 and ch == "{":
+                    self._object_start = i
+                self._depth += 1
+            elif ch == "}" or ch == "]":
+                if self._depth == 0:
+                    # End of the top-level array; ignore anything after it.
+                    self._in_array = False
+                    self._finished = True
+                    i = end
+                    break
+                self._depth -= 1
+                if self._depth == 0 and ch == "}" and self._object_start >= 0:
+                    obj = self._decode(buffer[self._object_start:i + 1])
+                    if obj is not None:
+                        completed.append(obj)
+                    self._object_start = -1
+            i += 1
+
+        # Drop consumed text so the buffer only holds the open object.
+        keep_from = self._object_start if self._object_start >= 0 else i
+        self._buffer = buffer[keep_from:]
+        self._pos = i - keep_from
+        if self._object_start >= 0:
+            self._object_start = 0
+        return completed
+
+    def _decode(self, text: str):
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError as e:
+            self.failed_objects += 1
+            logger.warning(f"Skipping malformed streamed object: {e}")
+            return None
+        return obj if isinstance(obj, dict) else None
@@ -0,0 +1,114 @@
+import asyncio
+import unittest
+
+import admission
+from admission import AdmissionController, Overloaded, UpstreamLimit
+
+
+async def hold(limit: UpstreamLimit, seconds: float = 0.05, timeout: float | None = 1.0) -> str:
+    async with limit.slot(timeout):
+        await asyncio.sleep(seconds)
+    return "ok"
+
+
+class AdmissionControllerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_waiters_run_by_priority_then_arrival(self):
+        controller = AdmissionController(max_active=1, max_queued=10, queue_timeout=1.0)
+        order = []
+        release = asyncio.Event()
+
+        async def first():
+            async with controller.admit():
+                await release.wait()
+
+        async def request(label: str, priority: int):
+            async with controller.admit(priority):
+                order.append(label)
+
+        holder = asyncio.create_task(first())
+        await asyncio.sleep(0)
+        waiters = [
+            asyncio.create_task(request("bulk", admission.PRIORITY_BULK)),
+            asyncio.create_task(request("uncached", admission.PRIORITY_UNCACHED)),
+            asyncio.create_task(request("interactive 1", admission.PRIORITY_INTERACTIVE)),
+            asyncio.create_task(request("interactive 2", admission.PRIORITY_INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        self.assertEqual(controller.waiting, 4)
+        release.set()
+        await asyncio.gather(holder, *waiters)
+        self.assertEqual(order, ["interactive 1", "interactive 2", "bulk", "uncached"])
+        self.assertEqual((controller.active, controller.waiting), (0, 0))
+
+    async def test_full_queue_is_shed_with_retry_after(self):
+        controller = AdmissionController(max_active=1, max_queued=1, queue_timeout=1.0)
+        release = asyncio.Event()
+
+        async def request():
+            async with controller.admit():
+                await release.wait()
+
+        tasks = [asyncio.create_task(request()) for _ in range(2)]
+        await asyncio.sleep(0)
+        with self.assertRaises(Overloaded) as raised:
+            async with controller.admit():
+                pass
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        self.assertEqual(controller.rejected, 1)
+        release.set()
+        await asyncio.gather(*tasks)
+
+    async def test_queue_timeout_is_shed(self):
+        controller = AdmissionController(max_active=1, max_queued=5, queue_timeout=0.02)
+        release = asyncio.Event()
+
+        async def request():
+            async with controller.admit():
+                await release.wait()
+
+        task = asyncio.create_task(request())
+        await asyncio.sleep(0)
+        with self.assertRaises(Overloaded):
+            async with controller.admit():
+                pass
+        self.assertEqual(controller.waiting, 0)
+        release.set()
+        await task
+        self.assertEqual(controller.active, 0)
+
+
+class UpstreamLimitTest(unittest.IsolatedAsyncioTestCase):
+    async def results(self, limit: UpstreamLimit, callers: int) -> list[str]:
+        outcomes = await asyncio.gather(*(hold(limit) for _ in range(callers)), return_exceptions=True)
+        return ["ok" if outcome == "ok" else type(outcome).__name__ for outcome in outcomes]
+
+    async def test_no_waiting_allowed_rejects_same_tick_callers(self):
+        limit = UpstreamLimit("test", 1, max_waiting=0)
+        self.assertEqual(await self.results(limit, 3), ["ok", "Overloaded", "Overloaded"])
+        self.assertEqual(limit.rejected, 2)
+
+    async def test_max_waiting_bounds_the_queue(self):
+        limit = UpstreamLimit("test", 1, max_waiting=1)
+        self.assertEqual(await self.results(limit, 4), ["ok", "ok", "Overloaded", "Overloaded"])
+        self.assertEqual(limit.stats(), {"active": 0, "waiting": 0, "rejected": 2})
+
+    async def test_callers_with_free_capacity_do_not_count_as_waiting(self):
+        limit = UpstreamLimit("test", 3, max_waiting=0)
+        self.assertEqual(await self.results(limit, 3), ["ok", "ok", "ok"])
+
+    async def test_cancelled_waiter_is_no_longer_counted(self):
+        limit = UpstreamLimit("test", 1, max_waiting=1)
+        holder = asyncio.create_task(hold(limit, 0.05))
+        waiter = asyncio.create_task(hold(limit))
+        await asyncio.sleep(0.01)
+        self.assertEqual(limit.waiting, 1)
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        self.assertEqual(limit.waiting, 0)
+        self.assertEqual(await hold(limit), "ok")
+        await holder
+
+
+if __name__ == "__main__":
+    unittest.main()
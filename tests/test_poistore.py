@@ -0,0 +1,53 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from poistore import PlaceStore
+from recommendation import Recommendation
+
+
+class PlaceStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = PlaceStore(Path(self.directory.name) / "places.sqlite3")
+
+    def tearDown(self):
+        self.store._db.close()
+        self.directory.cleanup()
+
+    def test_same_name_at_different_addresses_stays_apart(self):
+        self.store.remember([
+            Recommendation(name="Starbucks", location="1 Sejong-daero, Seoul", lat=37.5700, lon=126.9769),
+            Recommendation(name="Starbucks", location="2 Teheran-ro, Seoul", lat=37.4980, lon=127.0276),
+        ])
+        self.assertEqual(self.store.find("Starbucks", "1 Sejong-daero, Seoul", 37.55, 127.0, 30), (37.5700, 126.9769))
+        self.assertEqual(self.store.find("starbucks", "2 TEHERAN-RO, Seoul", 37.55, 127.0, 30), (37.4980, 127.0276))
+        self.assertIsNone(self.store.find("Starbucks", "3 Hangang-daero, Seoul", 37.55, 127.0, 30))
+
+    def test_find_respects_radius(self):
+        self.store.remember([Recommendation(name="Central Park", location="New York", lat=40.7829, lon=-73.9654)])
+        self.assertIsNone(self.store.find("Central Park", "New York", 37.55, 127.0, 30))
+
+    def test_seen_counts_only_generated(self):
+        place = Recommendation(name="Gyeongbokgung", location="161 Sajik-ro, Seoul", lat=37.5796, lon=126.9770)
+        self.store.remember([place])
+        self.store.remember([place], generated=False)
+        self.store.remember([place])
+        (seen,) = self.store._db.execute("SELECT seen FROM places").fetchone()
+        self.assertEqual(seen, 2)
+
+    def test_rebuilds_table_from_older_schema(self):
+        path = Path(self.directory.name) / "old.sqlite3"
+        db = sqlite3.connect(path)
+        db.execute("CREATE TABLE places (name_key TEXT NOT NULL, area TEXT NOT NULL, PRIMARY KEY (name_key, area))")
+        db.commit()
+        db.close()
+        store = PlaceStore(path)
+        store.remember([Recommendation(name="Starbucks", location="1 Sejong-daero, Seoul", lat=37.57, lon=126.98)])
+        self.assertEqual(store.find("Starbucks", "1 Sejong-daero, Seoul", 37.57, 126.98, 1), (37.57, 126.98))
+        store._db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import admission
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded
+
+NAME = "maps"
+
+
+class Response:
+    def __init__(self, status_code: int = 200):
+        self.status_code = status_code
+
+
+def upstream(seconds: float = 0.0, status_code: int = 200):
+    async def request():
+        await asyncio.sleep(seconds)
+        return Response(status_code)
+    return request
+
+
+class GuardedTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.circuit = CircuitBreaker(NAME, failure_threshold=2, reset_timeout=60)
+        patches = [
+            mock.patch.dict(resilience._breakers, {NAME: self.circuit}),
+            mock.patch.dict(admission._limits, {NAME: admission.UpstreamLimit(NAME, 2, max_waiting=64)}),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def open_half(self):
+        self.circuit.state = CircuitBreaker.OPEN
+        self.circuit.opened_at = -1e9
+
+    async def test_server_errors_open_the_circuit(self):
+        for _ in range(2):
+            response = await resilience.guarded(NAME, upstream(status_code=503), timeout=1)
+            self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.circuit.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            await resilience.guarded(NAME, upstream(), timeout=1)
+
+    async def test_local_queueing_does_not_count_as_upstream_failure(self):
+        # 12 callers through 2 slots to a 0.25 s upstream: most wait longer
+        # than the 0.6 s timeout for a slot, none of that is the upstream's fault.
+        outcomes = await asyncio.gather(
+            *(resilience.guarded(NAME, upstream(0.25), timeout=0.6) for _ in range(12)), return_exceptions=True,
+        )
+        self.assertTrue(all(isinstance(outcome, Response) for outcome in outcomes))
+        self.assertEqual(self.circuit.stats()["consecutive_failures"], 0)
+
+    async def test_timeout_with_the_full_budget_counts(self):
+        with self.assertRaises(DeadlineExceeded):
+            await resilience.guarded(NAME, upstream(1.0), timeout=0.1)
+        self.assertEqual(self.circuit.failures, 1)
+
+    async def test_timeout_cut_short_by_the_request_deadline_does_not_count(self):
+        with resilience.deadline(0.1):
+            with self.assertRaises(DeadlineExceeded):
+                await resilience.guarded(NAME, upstream(1.0), timeout=5)
+        self.assertEqual(self.circuit.failures, 0)
+
+    async def test_spent_deadline_skips_the_call(self):
+        request = mock.AsyncMock(return_value=Response())
+        self.open_half()
+        with resilience.deadline(resilience.UPSTREAM_MIN_CALL_SECONDS / 2):
+            with self.assertRaises(DeadlineExceeded):
+                await resilience.guarded(NAME, request, timeout=5)
+        request.assert_not_called()
+        self.assertEqual(self.circuit.failures, 0)
+        # The half-open trial was released, so the next call may be the trial.
+        self.circuit.before_call()
+
+    async def test_trial_cancelled_while_waiting_for_a_slot_is_released(self):
+        limit = admission._limits[NAME]
+        blockers = [asyncio.create_task(resilience.guarded(NAME, upstream(0.2), timeout=1)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        self.open_half()
+        trial = asyncio.create_task(resilience.guarded(NAME, upstream(), timeout=1))
+        await asyncio.sleep(0.01)
+        self.assertEqual(limit.waiting, 1)
+        trial.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await trial
+        self.circuit.before_call()
+        self.circuit.record_success()
+        await asyncio.gather(*blockers)
+
+    async def test_shed_trial_is_released(self):
+        admission._limits[NAME] = admission.UpstreamLimit(NAME, 1, max_waiting=0)
+        blocker = asyncio.create_task(resilience.guarded(NAME, upstream(0.05), timeout=1))
+        await asyncio.sleep(0)
+        self.open_half()
+        with self.assertRaises(admission.Overloaded):
+            await resilience.guarded(NAME, upstream(), timeout=1)
+        self.circuit.before_call()
+        self.circuit.record_success()
+        await blocker
+
+    async def test_success_in_half_open_closes_the_circuit(self):
+        self.open_half()
+        await resilience.guarded(NAME, upstream(), timeout=1)
+        self.assertEqual(self.circuit.state, CircuitBreaker.CLOSED)
+
+
+class HedgedTest(unittest.IsolatedAsyncioTestCase):
+    async def test_slow_first_attempt_is_hedged_and_cancelled(self):
+        calls = []
+
+        async def attempt():
+            calls.append(len(calls))
+            await asyncio.sleep(1.0 if len(calls) == 1 else 0.01)
+            return len(calls)
+
+        self.assertEqual(await resilience.hedged(attempt, delay=0.02), 2)
+        self.assertEqual(len(calls), 2)
+
+    async def test_fast_first_attempt_is_not_hedged(self):
+        attempt = mock.AsyncMock(return_value="first")
+        self.assertEqual(await resilience.hedged(attempt, delay=0.5), "first")
+        self.assertEqual(attempt.await_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from streamparse import JSONArrayStreamParser
+
+
+def feed_all(chunks: list[str]) -> list[dict]:
+    parser = JSONArrayStreamParser()
+    return [obj for chunk in chunks for obj in parser.feed(chunk)]
+
+
+def split(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class JSONArrayStreamParserTest(unittest.TestCase):
+    def test_whole_array(self):
+        self.assertEqual(feed_all(['[{"a": 1}, {"b": [2, 3]}]']), [{"a": 1}, {"b": [2, 3]}])
+
+    def test_prose_preamble_with_brackets(self):
+        self.assertEqual(feed_all(['Sure [see below]: [{"a":1}]']), [{"a": 1}])
+        self.assertEqual(feed_all(["Here [", "1] you go:\n```json\n[\n  ", '{"a": 1}\n]\n```']), [{"a": 1}])
+
+    def test_opening_bracket_split_from_its_object(self):
+        self.assertEqual(feed_all(["[", " ", '\n{"a": 1}]']), [{"a": 1}])
+
+    def test_braces_and_quotes_inside_strings_across_chunks(self):
+        text = '[{"n": "a } b ]", "q": "say \\"hi\\" {[", "e": "\\\\"}, {"x": "}]"}]'
+        expected = [{"n": "a } b ]", "q": 'say "hi" {[', "e": "\\"}, {"x": "}]"}]
+        for size in (1, 2, 3, 5, 7, len(text)):
+            with self.subTest(size=size):
+                self.assertEqual(feed_all(split(text, size)), expected)
+
+    def test_empty_array_and_text_after_the_array(self):
+        self.assertEqual(feed_all(['[]  then [{"a": 1}]']), [])
+        self.assertEqual(feed_all(['[{"a": 1}]', ' and [{"b": 2}]']), [{"a": 1}])
+
+    def test_malformed_object_is_skipped(self):
+        parser = JSONArrayStreamParser()
+        self.assertEqual(parser.feed('[{"a": tru}, {"b": 2}]'), [{"b": 2}])
+        self.assertEqual(parser.failed_objects, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
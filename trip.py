@@ -0,0 +1,90 @@
+import datetime
+from dataclasses import dataclass, field
+
+from forecast import DayForecast
+from recommendation import Recommendation
+
+EXCHANGE_RATE_KRW_TO_USD = 0.00073
+
+
+class TripError(Exception):
+    # kind is one of "location", "weather", "weather_incomplete",
+    # "unavailable" (an upstream timed out or its circuit is open), "date"
+    # (outside what the forecast covers) or "recommendations" (a batch prompt
+    # got no usable answer); each endpoint turns it into its own status code
+    # and wording.
+
+    def __init__(self, kind: str, message: str = ""):
+        super().__init__(message or kind)
+        self.kind = kind
+        self.message = message
+
+
+@dataclass
+class TripResult:
+    location: str
+    lat: float
+    lon: float
+    temperature: float
+    description: str
+    humidity: float | None
+    budget_krw: float
+    interests: list[str]
+    recommendations: list[Recommendation]
+    raw_ai: str = ""
+    # Set for trips on a given date (range); conditions then come from the
+    # forecast, with one entry per day in daily.
+    date: datetime.date | None = None
+    end_date: datetime.date | None = None
+    daily: list[DayForecast] = field(default_factory=list)
+    # Rendered bodies memoized per format: {format: (etag, body)}.
+    renderings: dict[str, tuple[str, bytes]] = field(default_factory=dict, repr=False)
+
+    @property
+    def cacheable(self) -> bool:
+        # A failed or empty Gemini answer leaves no recommendations; like an
+        # empty parse in the recommendation cache, it must not be reused.
+        return bool(self.recommendations)
+
+
+def format_budget(budget_krw: float) -> str:
+    if budget_krw <= 0:
+        return "Any"
+    budget_display = f"{budget_krw:,.0f} KRW"
+    if EXCHANGE_RATE_KRW_TO_USD > 0:
+        budget_usd = budget_krw * EXCHANGE_RATE_KRW_TO_USD
+        budget_display += f" (approx. ${budget_usd:,.2f} USD)"
+    return budget_display
+
+
+def format_dates(result: TripResult) -> str:
+    if result.date is None:
+        return "Now"
+    if result.end_date is None or result.end_date == result.date:
+        return result.date.isoformat()
+    return f"{result.date.isoformat()} to {result.end_date.isoformat()}"
+
+
+def format_interests(interests: list[str]) -> str:
+    return ", ".join(interests) if interests else "None"
+
+
+def format_cost(item: Recommendation) -> str:
+    cost_krw_val = item.cost_krw
+    cost_usd_val = item.cost_usd
+    cost_parts = []
+    if cost_krw_val > 0:
+        cost_parts.append(f"{cost_krw_val:,.0f} KRW")
+    if cost_usd_val > 0:
+        cost_parts.append(f"${cost_usd_val:,.2f} USD")
+    if cost_parts:
+        return " / ".join(cost_parts)
+    if cost_krw_val == 0 and cost_usd_val == 0:
+        return "Free"
+    return "N/A"
+
+
+def format_leg(item: Recommendation) -> str:
+    if item.leg_km is None:
+        return "N/A"
+    return f"{item.leg_km:,.1f} km, about {item.leg_minutes} min from the previous stop"
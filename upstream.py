@@ -0,0 +1,65 @@
+import os
+import logging
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# One pooled client per upstream host so a slow provider cannot starve the
+# connection pool of the others.
+UPSTREAMS = ("maps", "weather", "gemini")
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "5"))
+GEMINI_READ_TIMEOUT = float(os.getenv("GEMINI_READ_TIMEOUT", "60"))
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def _make_client(name: str) -> httpx.AsyncClient:
+    read_timeout = GEMINI_READ_TIMEOUT if name == "gemini" else HTTP_READ_TIMEOUT
+    timeout = httpx.Timeout(
+        connect=HTTP_CONNECT_TIMEOUT,
+        read=read_timeout,
+        write=HTTP_READ_TIMEOUT,
+        pool=HTTP_POOL_TIMEOUT,
+    )
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(timeout=timeout, limits=limits)
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    if name not in UPSTREAMS:
+        raise ValueError(f"Unknown upstream: {name}")
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _make_client(name)
+        _clients[name] = client
+    return client
+
+
+async def warm_client(name: str, url: str, timeout: float = 5.0):
+    # Opens a pooled connection (DNS, TCP, TLS) to the upstream's host ahead
+    # of real traffic. Any HTTP answer will do; nothing is authenticated.
+    origin = httpx.URL(url).copy_with(path="/", query=None)
+    try:
+        await get_client(name).head(origin, timeout=timeout)
+    except Exception as e:
+        logger.warning(f"Could not warm {name} client ({origin}): {e}")
+
+
+async def close_clients():
+    for name, client in list(_clients.items()):
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing {name} client: {e}")
+    _clients.clear()